@@ -0,0 +1,95 @@
+"""
+Shared customer lookup for the checkout flow.
+
+The manager UI calls /customers/lookup/{phone} while typing, then
+place_order and checkout_order need the same customer again for the
+discount. `lookup(db, phone)` normalizes the phone once (`normalize_phone`
+is the only normalizer in the app) and serves repeats from a bounded LRU,
+so a checkout does one customer read instead of three. Unknown numbers
+(including every partial number typed into the lookup box) go to a
+separate small bucket with a short TTL, so they never evict real
+customers.
+
+Call `invalidate(phone)` after any customer insert/update commits;
+changes made by other processes are picked up after TTL_SECONDS.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+import models
+
+TTL_SECONDS = float(os.getenv("CUSTOMER_CACHE_TTL_SECONDS", "300"))
+MISS_TTL_SECONDS = float(os.getenv("CUSTOMER_CACHE_MISS_TTL_SECONDS", "30"))
+MAX_CUSTOMERS = 1024
+MAX_MISSES = 256
+
+
+class CachedCustomer(NamedTuple):
+    id: int
+    phone: str
+    name: Optional[str]
+    relation: str
+    discount_percent: float
+
+
+def normalize_phone(phone):
+    return (phone or "").strip().replace(" ", "").replace("-", "")
+
+
+_lock = threading.Lock()
+_entries = OrderedDict()  # normalized phone -> (expires_at, CachedCustomer)
+_misses = OrderedDict()   # normalized phone -> (expires_at, None): unknown numbers
+
+
+def _get(phone):
+    with _lock:
+        for bucket in (_entries, _misses):
+            entry = bucket.get(phone)
+            if entry is None:
+                continue
+            if entry[0] < time.monotonic():
+                del bucket[phone]
+                return False, None
+            bucket.move_to_end(phone)
+            return True, entry[1]
+        return False, None
+
+
+def _put(phone, customer):
+    bucket, ttl, limit = (_entries, TTL_SECONDS, MAX_CUSTOMERS) if customer else (_misses, MISS_TTL_SECONDS, MAX_MISSES)
+    with _lock:
+        bucket[phone] = (time.monotonic() + ttl, customer)
+        bucket.move_to_end(phone)
+        while len(bucket) > limit:
+            bucket.popitem(last=False)
+
+
+def lookup(db, phone):
+    """CachedCustomer for phone (any formatting), or None. Takes a sync Session; use run_sync from async routes."""
+    phone = normalize_phone(phone)
+    if not phone:
+        return None
+    hit, customer = _get(phone)
+    if hit:
+        return customer
+    row = db.query(
+        models.Customer.id, models.Customer.phone, models.Customer.name,
+        models.Customer.relation, models.Customer.discount_percent
+    ).filter(models.Customer.phone == phone).first()
+    customer = CachedCustomer(row.id, row.phone, row.name, row.relation, row.discount_percent or 0.0) if row else None
+    _put(phone, customer)
+    return customer
+
+
+def invalidate(phone=None):
+    """Forget one phone (or everyone when phone is None)."""
+    with _lock:
+        if phone is None:
+            _entries.clear()
+            _misses.clear()
+        else:
+            _entries.pop(normalize_phone(phone), None)
+            _misses.pop(normalize_phone(phone), None)
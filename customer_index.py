@@ -0,0 +1,209 @@
+"""
+In-memory search index for the manager's customer search (GET /customers/?search=).
+
+`contains()` compiles to LIKE '%term%', which no B-tree index can serve, so
+every keystroke scanned the whole customers table. Instead this process keeps
+three sorted lists and answers typeahead with bisect:
+
+    phones    normalized phone        -> "98765" finds numbers starting with it
+    rphones   reversed phone          -> "4321" finds numbers ending with it
+    tokens    lowercased name words   -> "ram ku" finds "Ram Kumar" (every word must prefix-match a token)
+
+Only ids come out of the index; the route then loads at most one page of rows
+by primary key, so visit counts and discounts are always fresh.
+
+Terms shorter than MIN_TERM_LENGTH are not searched (the route shows the plain
+list), and at most MAX_CANDIDATES phone and MAX_CANDIDATES name candidates are
+ranked, taken in index order: lowest phone numbers and shortest name words
+first ("ram" before "ramesh"). A broader term shows the best of those and
+narrows as the manager keeps typing.
+
+Each index is an immutable snapshot: searches read whichever one is current
+without taking a lock, and writes install a modified copy. The index is built
+at startup (`warm()`, from the lifespan hook).
+
+Writers call `bump_version(db)` in the same transaction as the customer write
+and `apply(version, customer)` after the commit. Other workers see the bumped
+`cache_versions` row within VERSION_CHECK_SECONDS and rebuild in the
+background, serving their previous snapshot until the new one is ready.
+"""
+import bisect
+import copy
+import heapq
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import select
+
+import models
+from customer_cache import normalize_phone
+from database import SessionLocal
+
+CUSTOMERS_KEY = "customers"
+VERSION_CHECK_SECONDS = float(os.getenv("CUSTOMER_INDEX_CHECK_SECONDS", "5"))
+MIN_TERM_LENGTH = int(os.getenv("CUSTOMER_SEARCH_MIN_LENGTH", "3"))
+MAX_CANDIDATES = int(os.getenv("CUSTOMER_SEARCH_MAX_CANDIDATES", "2000"))
+_MAX = "\U0010ffff"
+
+_lock = threading.Lock()  # serializes swapping _index; searches never take it
+_index = None
+_checked_at = 0.0
+_reloading = False
+
+
+def _name_text(name):
+    """Lowercased name as " ram kumar": a word prefix-matches a token exactly when " " + word is a substring."""
+    return "".join(" " + token for token in (name or "").lower().split())
+
+
+def _entry(customer_id, phone, name, created_at):
+    """(normalized phone, name text, alpha key, recent key); the keys are get_customers' cursor keys."""
+    return (normalize_phone(phone), _name_text(name),
+            (1 if name is None else 0, name or "", customer_id),  # named A-Z, anonymous last
+            (created_at or datetime.min, customer_id))
+
+
+def _span(sorted_pairs, prefix):
+    """(i, j) bounds of the (key, id) pairs whose key starts with prefix."""
+    return (bisect.bisect_left(sorted_pairs, (prefix,)),
+            bisect.bisect_right(sorted_pairs, (prefix + _MAX,)))
+
+
+def _remove(sorted_list, item):
+    i = bisect.bisect_left(sorted_list, item)
+    if i < len(sorted_list) and sorted_list[i] == item:
+        del sorted_list[i]
+
+
+class _Index:
+    def __init__(self, version, rows):
+        self.version = version
+        self.entries = {}  # id -> _entry(): (normalized phone, name text, alpha key, recent key)
+        self.phones, self.rphones, self.tokens = [], [], []
+        for customer_id, phone, name, created_at in rows:
+            entry = self.entries[customer_id] = _entry(customer_id, phone, name, created_at)
+            for keys, item in self._placements(customer_id, entry):
+                keys.append(item)
+        for keys in (self.phones, self.rphones, self.tokens):
+            keys.sort()
+
+    def _placements(self, customer_id, entry):
+        """(sorted list, item) for every list the customer appears in."""
+        phone, text = entry[:2]
+        yield self.phones, (phone, customer_id)
+        yield self.rphones, (phone[::-1], customer_id)
+        for token in set(text.split()):
+            yield self.tokens, (token, customer_id)
+
+    def with_customer(self, version, customer_id, phone, name, created_at):
+        """A copy of this index at `version` with one customer added or updated; this one is left untouched."""
+        idx = copy.copy(self)
+        idx.version = version
+        idx.entries = dict(self.entries)
+        idx.phones, idx.rphones, idx.tokens = list(self.phones), list(self.rphones), list(self.tokens)
+
+        old = idx.entries.get(customer_id)
+        if old is not None:
+            for keys, item in idx._placements(customer_id, old):
+                _remove(keys, item)
+        entry = idx.entries[customer_id] = _entry(customer_id, phone, name, created_at)
+        for keys, item in idx._placements(customer_id, entry):
+            bisect.insort(keys, item)
+        return idx
+
+    def search(self, term, sort, limit, after=None):
+        digits = normalize_phone(term)
+        words = term.lower().split()
+        entries = self.entries
+
+        found = set()
+        if digits.lstrip("+").isdigit():
+            for pairs, prefix in ((self.phones, digits), (self.rphones, digits[::-1])):
+                i, j = _span(pairs, prefix)
+                found.update(pair[1] for pair in pairs[i:min(j, i + MAX_CANDIDATES - len(found))])
+        if words:
+            # Candidates from the narrowest word's range; each must then prefix-match the other words too
+            i, j = min((_span(self.tokens, word) for word in words), key=lambda span: span[1] - span[0])
+            named = {pair[1] for pair in self.tokens[i:min(j, i + MAX_CANDIDATES)]}
+            if len(words) > 1:
+                needles = [" " + word for word in words]
+                named = {c for c in named if all(needle in entries[c][1] for needle in needles)}
+            found |= named
+
+        # Same orders and cursor keys as the SQL paths in get_customers
+        if sort == "recent":
+            keys = [entries[i][3] for i in found]
+            if after is not None:
+                keys = [k for k in keys if k < after]
+            return [k[-1] for k in heapq.nlargest(limit, keys)]
+        keys = [entries[i][2] for i in found]
+        if after is not None:
+            keys = [k for k in keys if k > after]
+        return [k[-1] for k in heapq.nsmallest(limit, keys)]
+
+
+def _load(db):
+    """Build an index from the customers table and install it, unless apply() has already moved past it."""
+    global _index, _checked_at
+    version = models.read_version(db, CUSTOMERS_KEY)
+    start = time.perf_counter()
+    idx = _Index(version, db.execute(select(
+        models.Customer.id, models.Customer.phone, models.Customer.name, models.Customer.created_at)))
+    print(f"🔎 Customer index loaded: {len(idx.entries)} customers in {(time.perf_counter() - start) * 1000:.0f} ms")
+    with _lock:
+        if _index is None or _index.version <= version:
+            _index = idx
+        _checked_at = time.monotonic()
+        return _index
+
+
+def warm():
+    """Load the index in its own session: at startup, and in the background when the version moves."""
+    global _reloading
+    db = SessionLocal()
+    try:
+        _load(db)
+    except Exception as e:
+        print(f"⚠️ Customer index not loaded, will retry on the next search: {e}")
+    finally:
+        db.close()
+        _reloading = False
+
+
+def _current(db):
+    global _checked_at, _reloading
+    idx = _index
+    if idx is None:
+        return _load(db)  # not warmed at startup (database was down)
+    if time.monotonic() - _checked_at < VERSION_CHECK_SECONDS:
+        return idx
+    _checked_at = time.monotonic()
+    if models.read_version(db, CUSTOMERS_KEY) != idx.version:
+        with _lock:
+            spawn, _reloading = not _reloading, True
+        if spawn:
+            threading.Thread(target=warm, name="customer-index", daemon=True).start()
+    return idx  # keep serving this snapshot until the reload swaps in
+
+
+def search(db, term, sort="alpha", limit=100, after=None):
+    """Ids of customers matching term, ordered for `sort`, starting after the `after` sort key, capped at limit."""
+    return _current(db).search(term, sort, limit, after)
+
+
+def bump_version(db):
+    """Bump the shared customers version inside the caller's transaction; returns the new value."""
+    models.bump_version(db, CUSTOMERS_KEY)
+    return models.read_version(db, CUSTOMERS_KEY)
+
+
+def apply(version, customer):
+    """After commit: swap in a copy with the written customer, or recheck the version if another writer got in between."""
+    global _index, _checked_at
+    with _lock:
+        if _index is not None and _index.version == version - 1:
+            _index = _index.with_customer(version, customer.id, customer.phone, customer.name, customer.created_at)
+        else:
+            _checked_at = 0.0
@@ -1,8 +1,12 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 from dotenv import load_dotenv
+import pool_metrics
+import request_metrics
 
 # Load secrets from .env file
 load_dotenv()
@@ -13,17 +17,43 @@ SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
 if not SQLALCHEMY_DATABASE_URL:
     SQLALCHEMY_DATABASE_URL = "sqlite:///./restron.db"
 
-if "sqlite" in SQLALCHEMY_DATABASE_URL:
-    engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+IS_SQLITE = "sqlite" in SQLALCHEMY_DATABASE_URL
+
+# Pool settings (PostgreSQL), tunable per deployment without code changes
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+POOL_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))      # seconds to wait for a free connection
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))      # recycle connections after 1 hour
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets dashboard reads run alongside order writes; NORMAL sync is safe with WAL;
+    # busy_timeout makes a writer wait for the lock instead of failing with "database is locked"
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+if IS_SQLITE:
+    engine = create_engine(SQLALCHEMY_DATABASE_URL, poolclass=pool_metrics.TimedQueuePool,
+                           max_overflow=POOL_MAX_OVERFLOW, connect_args={"check_same_thread": False})
+    event.listen(engine, "connect", _sqlite_pragmas)
 else:
     # PostgreSQL connection with better error handling
     # pool_pre_ping: Test connections before using them
-    # pool_recycle: Recycle connections after 1 hour
     # connect_args: Connection timeout settings
     engine = create_engine(
         SQLALCHEMY_DATABASE_URL,
-        pool_pre_ping=True,  # Verify connections before using
-        pool_recycle=3600,   # Recycle connections after 1 hour
+        poolclass=pool_metrics.TimedQueuePool,
+        pool_size=POOL_SIZE,
+        max_overflow=POOL_MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        pool_pre_ping=POOL_PRE_PING,
+        pool_recycle=POOL_RECYCLE,
         connect_args={
             "connect_timeout": 10,  # 10 second connection timeout
             "options": "-c statement_timeout=30000"  # 30 second query timeout
@@ -31,4 +61,52 @@ else:
     )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
\ No newline at end of file
+
+
+# --- ASYNC ENGINE (hot API routes) ---
+# Same database through an asyncio driver: asyncpg for PostgreSQL, aiosqlite for SQLite.
+def async_database_url(url):
+    u = make_url(url)
+    backend = u.drivername.split("+")[0]
+    if backend == "sqlite":
+        return u.set(drivername="sqlite+aiosqlite")
+    if backend in ("postgres", "postgresql"):
+        query = dict(u.query)
+        if "sslmode" in query:  # libpq spelling -> asyncpg spelling
+            query["ssl"] = query.pop("sslmode")
+        return u.set(drivername="postgresql+asyncpg", query=query)
+    return u
+
+
+if IS_SQLITE:
+    async_engine = create_async_engine(async_database_url(SQLALCHEMY_DATABASE_URL),
+                                       poolclass=pool_metrics.TimedAsyncAdaptedQueuePool,
+                                       max_overflow=POOL_MAX_OVERFLOW)
+    event.listen(async_engine.sync_engine, "connect", _sqlite_pragmas)
+else:
+    async_engine = create_async_engine(
+        async_database_url(SQLALCHEMY_DATABASE_URL),
+        poolclass=pool_metrics.TimedAsyncAdaptedQueuePool,
+        pool_size=POOL_SIZE,
+        max_overflow=POOL_MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        pool_pre_ping=POOL_PRE_PING,
+        pool_recycle=POOL_RECYCLE,
+        connect_args={
+            "timeout": 10,  # asyncpg's connect timeout
+            "server_settings": {"statement_timeout": "30000"}
+        }
+    )
+
+pool_metrics.register("sync", engine, POOL_MAX_OVERFLOW)
+pool_metrics.register("async", async_engine.sync_engine, POOL_MAX_OVERFLOW)
+request_metrics.instrument(engine)
+request_metrics.instrument(async_engine.sync_engine)
+
+# expire_on_commit=False: async code can't lazy-load attributes after a commit
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+Base = declarative_base()
+
+# Readiness flag maintained by migrations.bootstrap_schema().
+# While "ready" is False, DB-backed routes answer 503 instead of hitting the DB.
+db_state = {"ready": False, "last_error": None, "last_attempt": None}
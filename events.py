@@ -0,0 +1,97 @@
+"""
+In-process order event bus for the kitchen display push stream.
+
+Route handlers (which run in the threadpool) call `broker.publish(...)`
+after committing; each connected SSE client gets the event through its
+own asyncio queue. The last HISTORY_SIZE events are kept so a client that
+reconnects with `Last-Event-ID` receives what it missed. If the id is too
+old (or from before a restart) the client is told to `resync`, i.e.
+refetch /kitchen-display/ once.
+
+Events live in this worker's memory only: run a single uvicorn worker for
+the kitchen stream, or put a shared bus in front when scaling out.
+"""
+import asyncio
+import json
+import threading
+from collections import deque
+
+HISTORY_SIZE = 500
+HEARTBEAT_SECONDS = 15
+
+ORDER_CREATED = "order-created"
+ORDER_COMPLETED = "order-completed"
+ORDER_CANCELLED = "order-cancelled"
+RESYNC = "resync"
+
+
+class EventBroker:
+    def __init__(self, history_size=HISTORY_SIZE):
+        self._lock = threading.Lock()
+        self._last_id = 0
+        self._history = deque(maxlen=history_size)
+        self._subscribers = set()  # {(loop, asyncio.Queue)}
+
+    def publish(self, event_type, data):
+        """Thread-safe; may be called from sync route handlers."""
+        with self._lock:
+            self._last_id += 1
+            event = (self._last_id, event_type, json.dumps(data, default=str))
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                pass  # subscriber's loop already closed
+
+    def subscribe(self, last_event_id=None):
+        """Register a subscriber; returns (queue, backlog of events the client missed)."""
+        queue = asyncio.Queue()
+        entry = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._subscribers.add(entry)
+            backlog = []
+            if last_event_id is not None:
+                oldest = self._history[0][0] if self._history else self._last_id + 1
+                if last_event_id > self._last_id or last_event_id < oldest - 1:
+                    backlog = [(self._last_id, RESYNC, "{}")]
+                else:
+                    backlog = [e for e in self._history if e[0] > last_event_id]
+        return entry, backlog
+
+    def unsubscribe(self, entry):
+        with self._lock:
+            self._subscribers.discard(entry)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+
+broker = EventBroker()
+
+
+def format_sse(event):
+    event_id, event_type, data = event
+    return f"id: {event_id}\nevent: {event_type}\ndata: {data}\n\n"
+
+
+async def stream(request, last_event_id=None):
+    """Async generator of SSE frames for one client, with heartbeats, until it disconnects."""
+    entry, backlog = broker.subscribe(last_event_id)
+    queue = entry[1]
+    try:
+        yield "retry: 3000\n\n"
+        for event in backlog:
+            yield format_sse(event)
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+                yield format_sse(event)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": heartbeat\n\n"
+    finally:
+        broker.unsubscribe(entry)
@@ -0,0 +1,127 @@
+"""
+Streaming order export for the accountant: orders joined with their line
+items over a date range, as CSV (one row per line item, order columns
+repeated) or NDJSON (one order per line with an "items" list).
+
+    GET /owner/export/?start=2025-04-01&end=2025-04-30&format=csv
+    python export.py --start 2025-04-01 --end 2025-04-30 --format ndjson -o april.ndjson
+
+Rows come off a server-side cursor (`stream_results` + `yield_per`) in
+(created_at, id) order and are written out batch by batch, so a year of
+orders streams in constant memory and the first bytes go out right away.
+Dates are UTC days, like /owner/history/; `end` is inclusive. Cancelled
+orders are included (see `status`) so the export reconciles with the
+kitchen's order numbers.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+import models
+from database import engine
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "2000"))
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+ORDER_FIELDS = ["order_id", "created_at", "status", "order_type", "table_number", "taken_by", "customer_phone",
+                "payment_method", "paid_at", "subtotal", "discount_applied", "gst_amount", "total_amount"]
+ITEM_FIELDS = ["item_name", "category", "is_veg", "quantity", "price"]
+
+_orders, _items = models.Order.__table__, models.OrderItem.__table__
+
+
+def date_range(start, end):
+    """(start, end) UTC datetimes for YYYY-MM-DD days, end inclusive; ValueError if malformed or reversed."""
+    start_dt = datetime.strptime(start, "%Y-%m-%d")
+    end_dt = datetime.strptime(end, "%Y-%m-%d") + timedelta(days=1) if end else start_dt + timedelta(days=1)
+    if end_dt <= start_dt:
+        raise ValueError("end is before start")
+    return start_dt, end_dt
+
+
+def _query(start_dt, end_dt):
+    return select(
+        _orders.c.id.label("order_id"), _orders.c.created_at, _orders.c.status, _orders.c.order_type,
+        _orders.c.table_number, _orders.c.taken_by, _orders.c.customer_phone, _orders.c.payment_method,
+        _orders.c.paid_at, _orders.c.subtotal, _orders.c.discount_applied, _orders.c.gst_amount,
+        _orders.c.total_amount, _items.c.item_name, _items.c.category, _items.c.is_veg, _items.c.quantity,
+        _items.c.price,
+    ).select_from(_orders.outerjoin(_items, _items.c.order_id == _orders.c.id)).where(
+        _orders.c.created_at >= start_dt, _orders.c.created_at < end_dt
+    ).order_by(_orders.c.created_at, _orders.c.id, _items.c.id)
+
+
+def _value(v):
+    return v.isoformat(sep=" ") if isinstance(v, datetime) else v
+
+
+def _batches(start_dt, end_dt):
+    """Lists of result rows, EXPORT_BATCH_SIZE at a time, off a server-side cursor."""
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE).execute(
+            _query(start_dt, end_dt))
+        for batch in result.partitions():
+            yield batch
+
+
+def csv_chunks(start_dt, end_dt):
+    buf = io.StringIO()
+    out = csv.writer(buf)
+    out.writerow(ORDER_FIELDS + ITEM_FIELDS)
+    yield buf.getvalue()
+    for batch in _batches(start_dt, end_dt):
+        buf.seek(0)
+        buf.truncate()
+        out.writerows([_value(v) for v in row] for row in batch)
+        yield buf.getvalue()
+
+
+def ndjson_chunks(start_dt, end_dt):
+    # Rows arrive grouped by order, so only the current order is held in memory
+    n = len(ORDER_FIELDS)
+    order = None
+    for batch in _batches(start_dt, end_dt):
+        lines = []
+        for row in batch:
+            if order is None or order["order_id"] != row[0]:
+                if order is not None:
+                    lines.append(json.dumps(order, separators=(",", ":")))
+                order = {k: _value(v) for k, v in zip(ORDER_FIELDS, row[:n])}
+                order["items"] = []
+            if row[n] is not None:
+                order["items"].append(dict(zip(ITEM_FIELDS, row[n:])))
+        if lines:
+            yield "\n".join(lines) + "\n"
+    if order is not None:
+        yield json.dumps(order, separators=(",", ":")) + "\n"
+
+
+def stream(start_dt, end_dt, fmt="csv"):
+    """Generator of text chunks for a StreamingResponse or a file."""
+    return csv_chunks(start_dt, end_dt) if fmt == "csv" else ndjson_chunks(start_dt, end_dt)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export orders and line items for a date range")
+    parser.add_argument("--start", required=True, help="first day, YYYY-MM-DD (UTC)")
+    parser.add_argument("--end", help="last day, inclusive (default: same as --start)")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+    parser.add_argument("-o", "--output", help="file to write (default: stdout)")
+    args = parser.parse_args()
+
+    start_dt, end_dt = date_range(args.start, args.end)
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for chunk in stream(start_dt, end_dt, args.format):
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+    if args.output:
+        print(f"✅ Exported {args.start} → {args.end or args.start} to {args.output}", file=sys.stderr)
@@ -0,0 +1,216 @@
+"""
+Synthetic order history for benchmarking analytics, history and CRM at scale.
+
+    python generate_history.py --days 365 --orders-per-day 400 --customers 50000
+    python generate_history.py --days 730 --orders-per-day 7000   # ~5M orders
+
+Generates paid (and a few cancelled) orders with line items from the real
+menu, spread over the days before --end using lunch/dinner peak hours
+(given in local time, stored in UTC like the app does), weekend uplift, a
+veg/non-veg table mix and a pool of regular customers with discounts. Rows
+go in with PostgreSQL COPY (executemany batches on other databases); hourly
+rollups are rebuilt for the generated range afterwards.
+
+Run `python reset_menu.py` first on an empty database. Running servers pick
+up the new history (and customers) within a few seconds via cache_versions.
+"""
+import argparse
+import csv
+import io
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, func, insert, select, text
+
+import customer_index
+import history_cache
+import migrations
+import models
+import rollups
+from database import engine, SessionLocal
+
+# Relative order volume per local hour (restaurant open 11:00-23:59)
+HOUR_WEIGHTS = {11: 3, 12: 9, 13: 12, 14: 8, 15: 3, 16: 2, 17: 3, 18: 5, 19: 9, 20: 13, 21: 12, 22: 7, 23: 3}
+WEEKEND_UPLIFT = 1.4
+PAYMENT_METHODS = (("UPI", 55), ("Cash", 30), ("Card", 15))
+FIRST_NAMES = ["Aarav", "Vivaan", "Aditya", "Rohan", "Rahul", "Amit", "Priya", "Ananya", "Sneha", "Pooja",
+               "Neha", "Kavya", "Ishaan", "Arjun", "Sanjay", "Meera", "Ritu", "Vikram", "Karan", "Simran"]
+LAST_NAMES = ["Sharma", "Verma", "Gupta", "Singh", "Kumar", "Agarwal", "Jain", "Mehta", "Chauhan", "Yadav"]
+
+ORDER_COLUMNS = ["id", "table_number", "status", "subtotal", "discount_applied", "gst_amount", "total_amount",
+                 "items_summary", "order_type", "customer_phone", "created_at", "taken_by", "payment_method",
+                 "paid_at", "table_status"]
+ITEM_COLUMNS = ["id", "order_id", "item_name", "quantity", "price", "is_veg", "category"]
+CUSTOMER_COLUMNS = ["id", "name", "phone", "relation", "discount_percent", "visit_count", "created_at"]
+
+
+class Writer:
+    """Bulk inserts: COPY ... FROM STDIN on PostgreSQL, executemany batches elsewhere."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.copy = conn.dialect.name == "postgresql" and conn.dialect.driver == "psycopg2"
+
+    def write(self, table, columns, rows):
+        if not rows:
+            return
+        if self.copy:
+            buf = io.StringIO()
+            out = csv.writer(buf)
+            for row in rows:
+                out.writerow(["" if v is None else v for v in row])  # unquoted empty field = NULL
+            buf.seek(0)
+            cursor = self.conn.connection.dbapi_connection.cursor()
+            cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buf)
+            cursor.close()
+        else:
+            self.conn.execute(insert(table), [dict(zip(columns, row)) for row in rows])
+
+
+def next_id(conn, model):
+    return (conn.execute(func.max(model.id).select()).scalar() or 0) + 1
+
+
+def make_customers(conn, rng, count, start):
+    existing = {p for (p,) in conn.execute(select(models.Customer.phone))}
+    first_id = next_id(conn, models.Customer)
+    customers = []
+    while len(customers) < count:
+        phone = f"{rng.choice('6789')}{rng.randrange(10 ** 9):09d}"
+        if phone in existing:
+            continue
+        existing.add(phone)
+        named = rng.random() < 0.7
+        discount = rng.choice((5.0, 10.0, 15.0)) if rng.random() < 0.1 else 0.0
+        customers.append([first_id + len(customers),
+                          f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}" if named else None,
+                          phone, "VIP" if discount >= 10 else "Regular", discount, 0,
+                          start - timedelta(days=rng.randint(0, 30))])
+    return customers
+
+
+def generate(args):
+    rng = random.Random(args.seed)
+    end = datetime.strptime(args.end, "%Y-%m-%d") if args.end else datetime.utcnow().replace(
+        hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+    start = end - timedelta(days=args.days - 1)
+    utc_offset = timedelta(hours=args.utc_offset)
+    hours, hour_weights = list(HOUR_WEIGHTS), list(HOUR_WEIGHTS.values())
+    methods, method_weights = zip(*PAYMENT_METHODS)
+
+    migrations.run_migrations()
+    db = SessionLocal()
+    menu = db.query(models.MenuItem).all()
+    db.close()
+    if not menu:
+        raise SystemExit("❌ The menu is empty - run `python reset_menu.py` first")
+    veg_menu = [i for i in menu if i.is_veg] or menu
+    menu_rows = {i.id: (i.name, i.price, i.is_veg, i.category) for i in menu}
+
+    started = time.perf_counter()
+    total_orders = total_items = 0
+    with engine.begin() as conn:
+        writer = Writer(conn)
+        customers = make_customers(conn, rng, args.customers, start)
+        writer.write(models.Customer.__table__, CUSTOMER_COLUMNS, customers)
+        print(f"👥 {len(customers)} customers")
+        order_id = next_id(conn, models.Order)
+        item_id = next_id(conn, models.OrderItem)
+        visits = [0] * len(customers)
+        orders, items = [], []
+
+        for day in range(args.days):
+            date = start + timedelta(days=day)
+            volume = args.orders_per_day * (WEEKEND_UPLIFT if date.weekday() >= 5 else 1.0)
+            for _ in range(max(0, round(rng.gauss(volume, volume * 0.1)))):
+                local = date + timedelta(hours=rng.choices(hours, hour_weights)[0], seconds=rng.randrange(3600))
+                created_at = local - utc_offset
+                delivery = rng.random() < args.delivery_share
+                pool = veg_menu if rng.random() < args.veg_share else menu
+                lines = {}
+                for dish in rng.sample(pool, min(len(pool), rng.choice((1, 1, 2, 2, 3, 3, 4, 5)))):
+                    lines[dish.id] = rng.choice((1, 1, 1, 2, 2, 3))
+                subtotal = sum(menu_rows[m][1] * q for m, q in lines.items())
+
+                customer = None
+                if customers and rng.random() < args.customer_share:
+                    # A few regulars account for most visits
+                    customer = int(len(customers) * rng.random() ** 2.5)
+                discount = round(subtotal * customers[customer][4] / 100, 2) if customer is not None else 0.0
+                gst = round((subtotal - discount) * 0.05, 2)
+                cancelled = rng.random() < args.cancel_rate
+                if customer is not None and not cancelled:
+                    visits[customer] += 1
+
+                orders.append([
+                    order_id, 0 if delivery else rng.choice(args.tables),
+                    "Cancelled" if cancelled else "Completed", round(subtotal, 2), discount, gst,
+                    round(subtotal - discount + gst, 2),
+                    ", ".join(f"{q}x {menu_rows[m][0]}" for m, q in lines.items()),
+                    "Delivery" if delivery else "Dine-in",
+                    customers[customer][2] if customer is not None else None,
+                    created_at, "Customer" if rng.random() < 0.6 else f"Waiter-{rng.choice(FIRST_NAMES)}",
+                    None if cancelled else rng.choices(methods, method_weights)[0],
+                    None if cancelled else created_at + timedelta(minutes=rng.randint(20, 90)),
+                    "Available",
+                ])
+                for m, q in lines.items():
+                    name, price, is_veg, category = menu_rows[m]
+                    items.append([item_id, order_id, name, q, price, is_veg, category])
+                    item_id += 1
+                order_id += 1
+
+            if len(orders) >= args.batch_size or day == args.days - 1:
+                writer.write(models.Order.__table__, ORDER_COLUMNS, orders)
+                writer.write(models.OrderItem.__table__, ITEM_COLUMNS, items)
+                total_orders += len(orders)
+                total_items += len(items)
+                orders, items = [], []
+                rate = total_orders / (time.perf_counter() - started)
+                print(f"   ... {date:%Y-%m-%d}: {total_orders} orders, {total_items} items ({rate:,.0f} orders/s)")
+
+        if any(visits):
+            customers_table = models.Customer.__table__
+            conn.execute(
+                customers_table.update()
+                .where(customers_table.c.id == bindparam("cid"))
+                .values(visit_count=customers_table.c.visit_count + bindparam("n")),
+                [{"cid": customers[i][0], "n": n} for i, n in enumerate(visits) if n])
+
+        if conn.dialect.name == "postgresql":  # explicit ids were used: move the sequences past them
+            for table in ("customers", "orders", "order_items"):
+                conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                                  f"(SELECT COALESCE(MAX(id), 1) FROM {table}))"))
+
+    print(f"📥 Loaded {total_orders} orders / {total_items} items in {time.perf_counter() - started:.1f}s")
+
+    db = SessionLocal()
+    try:
+        rollups.rebuild(db, since=start - utc_offset)
+        customer_index.bump_version(db)  # running servers reload their customer search index
+        history_cache.bump_version(db)   # ... and drop cached closed-day summaries
+        db.commit()
+    finally:
+        db.close()
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    print(f"✅ Done in {time.perf_counter() - started:.1f}s ({start:%Y-%m-%d} → {end:%Y-%m-%d})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-generate realistic order history")
+    parser.add_argument("--days", type=int, default=90, help="days of history (default 90)")
+    parser.add_argument("--end", help="last generated day, YYYY-MM-DD (default: yesterday)")
+    parser.add_argument("--orders-per-day", type=float, default=150, help="mean weekday orders (default 150)")
+    parser.add_argument("--customers", type=int, default=5000, help="regular customers to create (default 5000)")
+    parser.add_argument("--customer-share", type=float, default=0.35, help="orders linked to a customer (0.35)")
+    parser.add_argument("--veg-share", type=float, default=0.4, help="all-veg orders (0.4)")
+    parser.add_argument("--delivery-share", type=float, default=0.2, help="delivery orders (0.2)")
+    parser.add_argument("--cancel-rate", type=float, default=0.02, help="cancelled orders (0.02)")
+    parser.add_argument("--tables", type=lambda s: [int(t) for t in s.split(",")], default=list(range(1, 11)),
+                        help="comma-separated table numbers (default 1..10)")
+    parser.add_argument("--utc-offset", type=float, default=5.5, help="local time zone of HOUR_WEIGHTS (IST = 5.5)")
+    parser.add_argument("--batch-size", type=int, default=20000, help="orders per bulk write (default 20000)")
+    parser.add_argument("--seed", type=int, default=7)
+    generate(parser.parse_args())
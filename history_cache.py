@@ -0,0 +1,77 @@
+"""
+Cache for /owner/history/ results over closed date ranges.
+
+A day or month that ended before today (UTC) no longer receives orders, so
+its summary (revenue, veg split, item totals) is computed once and then
+served from memory; the paged order log is always read from the database.
+The only way a closed range changes is a late checkout re-pricing an order
+placed on an earlier day. checkout_order calls `bump_version(db)` in that
+transaction (and `invalidate(order.created_at)` after the commit, for this
+process); every other worker sees the bumped `cache_versions` row within
+VERSION_CHECK_SECONDS and drops its cached summaries.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import models
+
+HISTORY_KEY = "history"
+MAX_ENTRIES = 400  # ~ a year of days plus a few years of months
+VERSION_CHECK_SECONDS = float(os.getenv("HISTORY_VERSION_CHECK_SECONDS", "5"))
+
+_lock = threading.Lock()
+_entries = OrderedDict()  # (start, end) -> summary dict
+_version = None           # cache_versions value the entries were computed under
+_checked_at = 0.0
+
+
+def is_closed(end_dt):
+    return end_dt <= datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def current_version(db):
+    """The shared history version, re-read at most every VERSION_CHECK_SECONDS; a change drops every entry."""
+    global _version, _checked_at
+    if _version is not None and time.monotonic() - _checked_at < VERSION_CHECK_SECONDS:
+        return _version
+    version = models.read_version(db, HISTORY_KEY)
+    with _lock:
+        if version != _version:
+            _entries.clear()
+            _version = version
+        _checked_at = time.monotonic()
+    return version
+
+
+def get(key):
+    with _lock:
+        report = _entries.get(key)
+        if report is not None:
+            _entries.move_to_end(key)
+        return report
+
+
+def put(key, report, version):
+    """Store a summary computed under `version` (from current_version); dropped if the version moved on."""
+    with _lock:
+        if version != _version:
+            return
+        _entries[key] = report
+        _entries.move_to_end(key)
+        while len(_entries) > MAX_ENTRIES:
+            _entries.popitem(last=False)
+
+
+def bump_version(db):
+    """Bump the shared history version inside the caller's transaction (closed-day data changed)."""
+    models.bump_version(db, HISTORY_KEY)
+
+
+def invalidate(moment):
+    """Drop every cached range containing `moment` (this process; others follow the version bump)."""
+    with _lock:
+        for key in [k for k in _entries if k[0] <= moment < k[1]]:
+            del _entries[key]
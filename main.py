@@ -1,20 +1,40 @@
 from fastapi import FastAPI, Depends, HTTPException, status, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, RedirectResponse, JSONResponse
+from fastapi.responses import FileResponse, RedirectResponse, JSONResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, extract
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, desc, extract, insert, case, select
 from pydantic import BaseModel
-from typing import List, Optional
-from database import engine, SessionLocal
+from typing import List, Literal, Optional
+from database import SessionLocal, AsyncSessionLocal, db_state
 from passlib.context import CryptContext
 from datetime import timedelta, datetime
 from jose import jwt, JWTError
 import models
+import migrations
+import menu_cache
+import events
+import rollups
+import history_cache
+import receipts
+import storage
+import user_cache
+import pool_metrics
+import request_metrics
+import query_budget
+import pagination
+import customer_index
+import customer_cache
+import visit_counter
+import export
+import schemas
+from user_cache import StaffUser
 import os
-from reportlab.pdfgen import canvas
-from io import BytesIO
-from supabase import create_client, Client
+import secrets
+import time
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
 # --- 🔒 SECURITY CONFIGURATION ---
@@ -25,29 +45,49 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "fallback-dev-secret-change-in-prod")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 10  # 10 Minutes Session Limit
+# Refresh cookie renews the access token without a password; expires after this much inactivity
+REFRESH_TOKEN_IDLE_HOURS = int(os.getenv("REFRESH_TOKEN_IDLE_HOURS", "12"))
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")  # bearer token for Prometheus scrapes of /metrics
+
+# 2. Receipt Storage Config (RECEIPT_STORAGE=supabase|local|memory, see storage.py)
+receipt_storage = storage.create_storage()
+MENU_PDF_URL = os.getenv("MENU_PDF_URL",
+                         "https://jzuvinbqupubrcwbcqxn.supabase.co/storage/v1/object/public/menu/Desi%20Zaika.pdf")
+
+
+# 3. Floor Plan: dine-in table numbers, e.g. "1-10" or "1-40,101-120"
+def parse_floor_plan(spec: str) -> List[int]:
+    tables = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = map(int, part.split("-", 1))
+            tables.update(range(lo, hi + 1))
+        else:
+            tables.add(int(part))
+    return sorted(tables)
+
 
-# 2. Supabase Storage Config
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+TABLE_NUMBERS = parse_floor_plan(os.getenv("FLOOR_PLAN", "1-10"))
 
-# Initialize Supabase Client
-if SUPABASE_URL and SUPABASE_KEY:
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-else:
-    print("⚠️ WARNING: Supabase credentials missing in .env. Receipt upload will fail.")
-    supabase = None
 
 # --- APP SETUP ---
-# Create Database Tables if they don't exist (non-blocking)
-try:
-    models.Base.metadata.create_all(bind=engine)
-    print("✅ Database connection successful - Tables ready")
-except Exception as e:
-    print(f"⚠️ WARNING: Database connection failed at startup: {e}")
-    print("⚠️ App will start, but database operations may fail until connection is restored")
-    print("⚠️ Tables will be created automatically on first successful connection")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One-time schema bootstrap + migrations (non-blocking: app still starts if DB is down)
+    migrations.bootstrap_schema()
+    if not db_state["ready"]:
+        print("⚠️ App will start, but database routes return 503 until the connection is restored")
+    else:
+        await run_in_threadpool(customer_index.warm)  # so the first customer search does not build it
+    yield
+    receipts.shutdown()
+    visit_counter.shutdown()
 
-app = FastAPI(title="Desi Zaika OS - Cloud Edition")
+
+app = FastAPI(title="Desi Zaika OS - Cloud Edition", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -57,24 +97,81 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Routes that issue or clear the session cookies themselves
+SESSION_ROUTES = ("/token", "/token/refresh", "/logout")
+
+
+def sets_session_cookies(response: Response) -> bool:
+    return any(header == b"set-cookie" and value.startswith((b"access_token=", b"refresh_token="))
+               for header, value in response.raw_headers)
+
+
+@app.middleware("http")
+async def sliding_session(request: Request, call_next):
+    """Renew the access cookie from the refresh cookie when it is missing or half-used (no bcrypt involved)"""
+    session = None
+    refresh_token = request.cookies.get("refresh_token")
+    if (request.url.path not in SESSION_ROUTES and refresh_token
+            and access_token_needs_renewal(request.cookies.get("access_token"))):
+        session = await run_in_threadpool(session_from_refresh_token, refresh_token)  # checks the DB denylist
+    if session:
+        renewed = Response()
+        request.state.access_token = set_session_cookies(renewed, *session)
+    response = await call_next(request)
+    # Never override cookies the handler set or deleted itself
+    if session and not sets_session_cookies(response):
+        for header, value in renewed.raw_headers:
+            if header == b"set-cookie":
+                response.raw_headers.append((header, value))
+    return response
+
+
+def route_label(request: Request):
+    route = request.scope.get("route")
+    return route.path if route else "unmatched"
+
+
+@app.middleware("http")
+async def timing(request: Request, call_next):
+    """Per-request latency, SQL count and SQL time -> Server-Timing header and /metrics (outermost middleware)"""
+    stats, token = request_metrics.begin()
+    try:
+        response = await call_next(request)
+    except Exception:
+        request_metrics.finish(stats, request.method, route_label(request), 500)
+        raise
+    finally:
+        request_metrics.end(token)
+    response.headers["Server-Timing"] = request_metrics.finish(
+        stats, request.method, route_label(request), response.status_code)
+    return response
+
+
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
 # --- DATABASE DEPENDENCY ---
 def get_db():
+    # Fail fast while the DB is down instead of piling requests onto it
+    if not migrations.ensure_schema():
+        raise HTTPException(status_code=503, detail="Database unavailable, please retry shortly")
     db = SessionLocal()
     try:
-        # Try to create tables if they don't exist (lazy initialization)
-        try:
-            models.Base.metadata.create_all(bind=engine)
-        except Exception:
-            pass  # Tables might already exist or DB might be temporarily unavailable
         yield db
     finally:
         db.close()
 
 
+async def get_async_db():
+    """AsyncSession for the hot routes; same readiness gate as get_db"""
+    if not db_state["ready"] and not await run_in_threadpool(migrations.ensure_schema):
+        raise HTTPException(status_code=503, detail="Database unavailable, please retry shortly")
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 # --- DATA SCHEMAS ---
 class OrderItemSchema(BaseModel):
     menu_item_id: int
@@ -119,18 +216,99 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-def get_current_user(request: Request, db: Session = Depends(get_db)):
-    token = request.cookies.get("access_token")
+def create_refresh_token(user: StaffUser, sid: str):
+    return create_access_token(data={"sub": user.username, "role": user.role, "type": "refresh", "sid": sid},
+                               expires_delta=timedelta(hours=REFRESH_TOKEN_IDLE_HOURS))
+
+
+def set_session_cookies(response: Response, user: StaffUser, sid: Optional[str] = None):
+    """Fresh access + refresh cookies for session `sid` (a new session when None); returns the new access token"""
+    sid = sid or secrets.token_urlsafe(16)
+    access_token = create_access_token(data={"sub": user.username, "role": user.role, "sid": sid},
+                                       expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    # Store secure JWT in HttpOnly cookie
+    response.set_cookie(key="access_token", value=access_token, httponly=True)
+    response.set_cookie(key="refresh_token", value=create_refresh_token(user, sid), httponly=True,
+                        max_age=REFRESH_TOKEN_IDLE_HOURS * 3600)
+    return access_token
+
+
+def access_token_needs_renewal(token: Optional[str]) -> bool:
+    """Missing, invalid/expired, or past half its lifetime"""
+    if not token:
+        return True
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return True
+    remaining = payload.get("exp", 0) - time.time()
+    return remaining < ACCESS_TOKEN_EXPIRE_MINUTES * 30
+
+
+def session_from_refresh_token(token: str):
+    """(user, sid) for a valid refresh token whose session was not logged out; None otherwise"""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    if payload.get("type") != "refresh" or not payload.get("sub") or not payload.get("sid"):
+        return None
+    try:
+        user = load_staff_user(payload["sub"])
+        if session_revoked(payload["sid"]):
+            return None
+    except HTTPException:
+        return None  # DB down: let the request continue unauthenticated
+    if not user or user.role != payload.get("role"):
+        return None
+    return user, payload["sid"]
+
+
+def session_revoked(sid: str) -> bool:
+    # Not cached: renewals are rare (once per half access-token lifetime) and must see other workers' logouts
+    if not migrations.ensure_schema():
+        raise HTTPException(status_code=503, detail="Database unavailable, please retry shortly")
+    db = SessionLocal()
+    try:
+        return db.query(models.RevokedSession.sid).filter(models.RevokedSession.sid == sid).first() is not None
+    finally:
+        db.close()
+
+
+def load_staff_user(username: str) -> Optional[StaffUser]:
+    """Account behind a token, from user_cache; only a cache miss touches the DB"""
+    hit, user = user_cache.get(username)
+    if hit:
+        return user
+    if not migrations.ensure_schema():
+        raise HTTPException(status_code=503, detail="Database unavailable, please retry shortly")
+    db = SessionLocal()
+    try:
+        row = db.query(models.User.id, models.User.username, models.User.role).filter(
+            models.User.username == username).first()
+    finally:
+        db.close()
+    user = StaffUser(*row) if row else None
+    user_cache.put(username, user)
+    return user
+
+
+def get_current_user(request: Request) -> Optional[StaffUser]:
+    # Trusts the signed claims; the cached account check catches revoked users and role changes
+    # A token renewed by the sliding_session middleware on this request wins over the stale cookie
+    token = getattr(request.state, "access_token", None) or request.cookies.get("access_token")
     if not token: return None
 
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
-        if username is None: return None
+        if username is None or payload.get("type") == "refresh": return None
     except JWTError:
         return None
 
-    user = db.query(models.User).filter(models.User.username == username).first()
+    user = load_staff_user(username)
+    if not user or user.role != payload.get("role"):
+        return None
     return user
 
 
@@ -148,43 +326,41 @@ def mobile_menu(): return FileResponse("static/menu.html")
 
 
 @app.get("/kitchen")
-def kitchen_page(user: models.User = Depends(get_current_user)):
+def kitchen_page(user: StaffUser = Depends(get_current_user)):
     if not user or user.role not in ["owner", "manager", "waiter", "chef"]:
         return RedirectResponse("/login")
     return FileResponse("static/kitchen.html")
 
 
 @app.get("/waiter")
-def waiter_page(user: models.User = Depends(get_current_user)):
+def waiter_page(user: StaffUser = Depends(get_current_user)):
     if not user or user.role not in ["waiter", "manager", "owner"]: return RedirectResponse("/login")
     return FileResponse("static/waiter.html")
 
 
 @app.get("/manager")
-def manager_page(user: models.User = Depends(get_current_user)):
+def manager_page(user: StaffUser = Depends(get_current_user)):
     if not user or user.role not in ["manager", "owner"]: return RedirectResponse("/login")
     return FileResponse("static/manager.html")
 
 
 @app.get("/owner")
-def owner_page(user: models.User = Depends(get_current_user)):
+def owner_page(user: StaffUser = Depends(get_current_user)):
     if not user or user.role != "owner": return RedirectResponse("/login")
     return FileResponse("static/owner.html")
 
 
 # --- 🔐 SECURE LOGIN API ---
 @app.post("/token")
-async def login(response: Response, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+def login(response: Response, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    # Sync handler: bcrypt runs on the threadpool instead of blocking the event loop for every request
     user = db.query(models.User).filter(models.User.username == form_data.username).first()
     if not user or not verify_password(form_data.password, user.password_hash):
         raise HTTPException(status_code=400, detail="Incorrect username or password")
+    staff = StaffUser(user.id, user.username, user.role)
+    user_cache.put(user.username, staff)
 
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(data={"sub": user.username, "role": user.role},
-                                       expires_delta=access_token_expires)
-
-    # Store secure JWT in HttpOnly cookie
-    response.set_cookie(key="access_token", value=access_token, httponly=True)
+    access_token = set_session_cookies(response, staff)
 
     redirect_url = "/mobile"
     if user.role == "owner":
@@ -198,254 +374,164 @@ async def login(response: Response, form_data: OAuth2PasswordRequestForm = Depen
 
 
 @app.post("/logout")
-def logout(response: Response):
+def logout(request: Request, response: Response, db: Session = Depends(get_db)):
+    # Revoke the session server-side too, so a copied refresh cookie stops working on every worker
+    sid = token_session_id(request.cookies.get("refresh_token")) or token_session_id(request.cookies.get("access_token"))
+    if sid:
+        now = datetime.utcnow()
+        db.query(models.RevokedSession).filter(models.RevokedSession.expires_at < now).delete()
+        if not db.query(models.RevokedSession.sid).filter(models.RevokedSession.sid == sid).first():
+            db.add(models.RevokedSession(sid=sid, expires_at=now + timedelta(hours=REFRESH_TOKEN_IDLE_HOURS)))
+        db.commit()
     response.delete_cookie("access_token")
+    response.delete_cookie("refresh_token")
     return {"status": "Logged out"}
 
 
+def token_session_id(token: Optional[str]) -> Optional[str]:
+    if not token:
+        return None
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sid")
+    except JWTError:
+        return None
+
+
+@app.post("/token/refresh")
+def refresh_session(request: Request, response: Response):
+    """Explicit renewal for API clients; browsers get this automatically via sliding_session"""
+    session = session_from_refresh_token(request.cookies.get("refresh_token") or "")
+    if not session:
+        raise HTTPException(status_code=401, detail="Session expired, please log in again")
+    return {"access_token": set_session_cookies(response, *session), "token_type": "bearer"}
+
+
+@app.get("/metrics")
+def metrics(request: Request, user: StaffUser = Depends(get_current_user)):
+    """Prometheus scrape endpoint: `Authorization: Bearer $METRICS_TOKEN` for scrapers, or an owner/manager login"""
+    auth = request.headers.get("authorization", "")
+    scraper = bool(METRICS_TOKEN) and secrets.compare_digest(auth.encode(), f"Bearer {METRICS_TOKEN}".encode())
+    if not scraper and (not user or user.role not in ["owner", "manager"]):
+        raise HTTPException(status_code=401, detail="Not authorized")
+    return Response(content=pool_metrics.render() + request_metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/health")
+def health():
+    """Readiness probe: 200 once the schema bootstrap has succeeded, 503 otherwise"""
+    ready = migrations.ensure_schema()
+    return JSONResponse(status_code=200 if ready else 503,
+                        content={"database": "ready" if ready else "unavailable", "error": db_state["last_error"]})
+
+
+# --- 👥 STAFF MANAGEMENT (owner only) ---
+class RoleUpdate(BaseModel):
+    role: Literal["owner", "manager", "waiter", "chef"]  # anything else is a 422, not a locked-out user
+
+
+@app.put("/users/{username}/role")
+def change_role(username: str, r: RoleUpdate, user: StaffUser = Depends(get_current_user),
+                db: Session = Depends(get_db)):
+    if not user or user.role != "owner":
+        raise HTTPException(status_code=401, detail="Not authorized")
+    staff = db.query(models.User).filter(models.User.username == username).first()
+    if not staff:
+        raise HTTPException(status_code=404, detail="User not found")
+    staff.role = r.role
+    db.commit()
+    user_cache.invalidate(username)  # their existing tokens stop working on the next request
+    return {"status": "Updated", "username": username, "role": r.role}
+
+
+@app.delete("/users/{username}")
+def revoke_user(username: str, user: StaffUser = Depends(get_current_user), db: Session = Depends(get_db)):
+    if not user or user.role != "owner":
+        raise HTTPException(status_code=401, detail="Not authorized")
+    deleted = db.query(models.User).filter(models.User.username == username).delete()
+    db.commit()
+    user_cache.invalidate(username)
+    if not deleted:
+        raise HTTPException(status_code=404, detail="User not found")
+    return {"status": "Revoked", "username": username}
+
+
 # --- 🧾 CLOUD RECEIPT GENERATOR ---
+if receipt_storage:
+    receipts.configure(upload=receipt_storage.put, find=receipt_storage.find)
+
+
+def receipt_response(job):
+    """Shape shared by /receipt/{order_id} and the job status route (WhatsApp message is built by the frontend)"""
+    body = {
+        "status": job["status"],
+        "job_id": job["job_id"],
+        "status_url": f"/receipt/jobs/{job['job_id']}",
+        "pdf_url": job["pdf_url"],
+        "menu_url": MENU_PDF_URL,
+        "order_id": job["order_id"],
+        "total": job["total"],
+        "discount": job["discount"],
+    }
+    if job["status"] == receipts.FAILED:
+        body["detail"] = f"Failed to generate receipt: {job['error']}"
+    return body
+
+
 @app.get("/receipt/{order_id}")
 def generate_receipt(order_id: int, db: Session = Depends(get_db)):
-    try:
-        order = db.query(models.Order).filter(models.Order.id == order_id).first()
-        if not order:
-            raise HTTPException(status_code=404, detail="Order not found")
+    """Return the published receipt, or queue it for rendering + upload; poll status_url for pdf_url"""
+    order = db.query(models.Order).filter(models.Order.id == order_id).first()
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    items = db.query(models.OrderItem).filter(models.OrderItem.order_id == order.id).all()
 
-        # 1. Generate PDF in Memory (80mm thermal receipt width = 227 points)
-        buffer = BytesIO()
-        # Use Letter size and adjust layout - better for viewing on screens
-        c = canvas.Canvas(buffer, pagesize=(227, 900))  # Increased height for better spacing
-
-        y = 880
-
-        # Premium Header with decorative box
-        c.setLineWidth(2.5)
-        c.rect(8, y-50, 211, 45, stroke=1, fill=0)
-        # Decorative corner elements
-        c.setLineWidth(1)
-        c.line(8, y-5, 18, y-5)
-        c.line(8, y-5, 8, y-15)
-        c.line(219, y-5, 209, y-5)
-        c.line(219, y-5, 219, y-15)
-        c.line(8, y-50, 18, y-50)
-        c.line(8, y-50, 8, y-40)
-        c.line(219, y-50, 209, y-50)
-        c.line(219, y-50, 219, y-40)
-        y -= 12
-
-        c.setFont("Helvetica-Bold", 18)
-        c.drawCentredString(113, y, "DESI ZAIKA")
-        y -= 16
-        c.setFont("Helvetica", 10)
-        c.drawCentredString(113, y, "Authentic Flavors")
-        y -= 12
-        c.setFont("Helvetica", 8)
-        c.drawCentredString(113, y, "Ghaziabad")
-        y -= 25
-
-        # Tax Invoice Header with decorative lines
-        c.setLineWidth(1)
-        c.line(10, y, 217, y)
-        y -= 8
-        c.setFont("Helvetica-Bold", 12)
-        c.drawCentredString(113, y, "TAX INVOICE")
-        y -= 8
-        c.line(10, y, 217, y)
-        y -= 18
-
-        # Order Details in box format
-        c.setFont("Helvetica", 9)
-        c.drawString(12, y, f"Order Number: #{order.id}")
-        table_text = f"Table: {order.table_number}" if order.order_type == "Dine-in" else f"{order.order_type} Order"
-        c.drawRightString(215, y, table_text)
-        y -= 14
-        c.drawString(12, y, f"Date: {order.created_at.strftime('%d %B %Y')}")
-        c.drawRightString(215, y, f"Time: {order.created_at.strftime('%I:%M %p')}")
-        y -= 20
-
-        # Items Section Header with double line
-        c.setLineWidth(1.5)
-        c.line(10, y, 217, y)
-        y -= 2
-        c.line(10, y, 217, y)
-        y -= 12
-        c.setFont("Helvetica-Bold", 9)
-        c.drawString(12, y, "ITEM DESCRIPTION")
-        c.drawString(140, y, "QTY")
-        c.drawRightString(215, y, "AMOUNT")
-        y -= 3
-        c.setLineWidth(1.5)
-        c.line(10, y, 217, y)
-        y -= 12
-
-        # Items List
-        c.setFont("Helvetica", 9)
-        items = db.query(models.OrderItem).filter(models.OrderItem.order_id == order.id).all()
-        for item in items:
-            # Better item name truncation with proper spacing
-            item_name = item.item_name[:20] if len(item.item_name) > 20 else item.item_name
-            # Draw item name (left aligned)
-            c.drawString(12, y, item_name)
-            # Draw quantity (centered in QTY column)
-            qty_width = c.stringWidth(str(item.quantity), "Helvetica", 9)
-            c.drawString(145 + (25 - qty_width)/2, y, str(item.quantity))
-            # Draw amount (right aligned)
-            amount = item.price * item.quantity
-            c.drawRightString(215, y, f"₹{amount:.2f}")
-            y -= 16  # Increased spacing between items
-            if y < 150: 
-                c.showPage() 
-                y = 880
-
-        y -= 5
-        c.setLineWidth(1.5)
-        c.line(10, y, 217, y)
-        y -= 18
-
-        # Bill Summary with proper alignment
-        c.setFont("Helvetica", 9)
-        c.drawRightString(150, y, "Subtotal:")
-        c.drawRightString(215, y, f"₹{order.subtotal:.2f}")
-        y -= 14
-
-        if order.discount_applied > 0:
-            discount_pct = (order.discount_applied / order.subtotal * 100) if order.subtotal > 0 else 0
-            c.drawRightString(150, y, f"Discount ({discount_pct:.0f}%):")
-            c.drawRightString(215, y, f"-₹{order.discount_applied:.2f}")
-            y -= 3
-            c.setLineWidth(0.5)
-            c.line(140, y, 215, y)
-            y -= 12
-            c.drawRightString(150, y, "Subtotal after disc:")
-            c.drawRightString(215, y, f"₹{order.subtotal - order.discount_applied:.2f}")
-            y -= 14
-
-        c.drawRightString(150, y, "GST @ 5%:")
-        c.drawRightString(215, y, f"₹{order.gst_amount:.2f}")
-        y -= 5
-
-        # Double line before total
-        c.setLineWidth(1.5)
-        c.line(10, y, 217, y)
-        y -= 2
-        c.line(10, y, 217, y)
-        y -= 16
-
-        c.setFont("Helvetica-Bold", 13)
-        c.drawRightString(150, y, "GRAND TOTAL:")
-        c.drawRightString(215, y, f"₹{order.total_amount:.2f}")
-        y -= 5
-        c.setLineWidth(1.5)
-        c.line(10, y, 217, y)
-        y -= 18
-
-        # Payment Info
-        c.setFont("Helvetica", 9)
-        if order.payment_method:
-            c.drawString(12, y, f"Payment Method: {order.payment_method.upper()}")
-            if order.paid_at:
-                c.drawRightString(215, y, f"Payment Time: {order.paid_at.strftime('%I:%M %p')}")
-            y -= 18
-
-        # Savings Message with decorative box
-        if order.discount_applied > 0:
-            c.setLineWidth(1)
-            c.rect(12, y-12, 193, 14, stroke=1, fill=0)
-            c.setFont("Helvetica-Bold", 10)
-            c.drawCentredString(113, y-2, f" You saved ₹{order.discount_applied:.2f} with your VIP discount!")
-            y -= 22
-
-        # Footer with decorative lines
-        c.setLineWidth(1.5)
-        c.line(10, y, 217, y)
-        y -= 2
-        c.line(10, y, 217, y)
-        y -= 14
-        c.setFont("Helvetica-Bold", 11)
-        c.drawCentredString(113, y, "Thank you for your visit!")
-        y -= 12
-        c.setFont("Helvetica", 9)
-        c.drawCentredString(113, y, "Please come again")
-        y -= 18
-        c.setLineWidth(1.5)
-        c.line(10, y, 217, y)
-        y -= 12
-
-        # Contact Info
-        c.setFont("Helvetica", 7)
-        c.drawCentredString(113, y, "Shop No. 46-47, 3rd Floor Food Court,")
-        y -= 9
-        c.drawCentredString(113, y, "Wave Galleria Shopping Complex, Wave City, Ghaziabad")
-        y -= 9
-        c.drawCentredString(113, y, "Call Us: +91 7683017632")
-        y -= 12
-
-        # Final decorative double line
-        c.setLineWidth(2)
-        c.line(10, y, 217, y)
-        y -= 2
-        c.line(10, y, 217, y)
-
-        c.save()
-
-        buffer.seek(0)
-
-        # 2. Upload to Supabase Storage
-        filename = f"receipt_{order_id}.pdf"
-        bucket_name = "receipts"
-
-        if not supabase: raise Exception("Supabase not configured")
-
-        supabase.storage.from_(bucket_name).upload(
-            file=buffer.getvalue(),
-            path=filename,
-            file_options={"content-type": "application/pdf", "upsert": "true"}
-        )
+    job = receipts.submit(*receipts.snapshot_order(order, items))
+    # 200 when an identical receipt is already published, 202 while it is being built
+    return JSONResponse(status_code=200 if job["status"] == receipts.DONE else 202, content=receipt_response(job))
 
-        # 3. Get Public URL
-        public_url = supabase.storage.from_(bucket_name).get_public_url(filename)
 
-        # 4. Get Menu PDF URL
-        menu_url = "https://jzuvinbqupubrcwbcqxn.supabase.co/storage/v1/object/public/menu/Desi%20Zaika.pdf"
+@app.get("/receipt/jobs/{job_id}")
+def receipt_status(job_id: str):
+    job = receipts.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Receipt job not found")
+    return receipt_response(job)
 
-        # 5. Create WhatsApp message (will be formatted by frontend with customer phone)
-        return {
-            "pdf_url": public_url,
-            "menu_url": menu_url,
-            "order_id": order.id,
-            "total": order.total_amount,
-            "discount": order.discount_applied
-        }
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"Receipt generation error: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to generate receipt: {str(e)}")
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"Receipt generation error: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to generate receipt: {str(e)}")
+# Receipts kept by the local/memory storage backends (content-addressed, so cacheable forever)
+@app.get("/files/receipts/{filename}")
+def stored_receipt(filename: str):
+    with request_metrics.timed("storage_read"):
+        data = receipt_storage.read(filename) if receipt_storage else None
+    if data is None:
+        raise HTTPException(status_code=404, detail="Receipt not found")
+    return Response(content=data, media_type="application/pdf",
+                    headers={"Cache-Control": "public, max-age=31536000, immutable"})
 
 
 # --- STANDARD API ROUTES ---
-@app.get("/menu/")
-def read_menu(db: Session = Depends(get_db)):
-    return db.query(models.MenuItem).all()
+@app.get("/menu/", response_model=List[schemas.MenuItemOut])
+@query_budget.limit(2)
+async def read_menu(request: Request, db: AsyncSession = Depends(get_async_db)):
+    # Served from the pre-serialized snapshot; unchanged menus get a bodiless 304
+    snap = menu_cache.peek() or await db.run_sync(menu_cache.get_snapshot)
+    headers = {"ETag": snap["etag"], "Cache-Control": "no-cache"}
+    if menu_cache.etag_matches(request.headers.get("if-none-match"), snap["etag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=snap["body"], media_type="application/json", headers=headers)
 
 
 @app.post("/menu/")
 def create_item(name: str, price: float, category: str, db: Session = Depends(get_db)):
     db.add(models.MenuItem(name=name, price=price, category=category))
-    db.commit()
+    menu_cache.commit_and_bump(db)
     return {"status": "Added"}
 
 
 @app.delete("/menu/{item_id}")
 def delete_item(item_id: int, db: Session = Depends(get_db)):
     db.query(models.MenuItem).filter(models.MenuItem.id == item_id).delete()
-    db.commit()
+    menu_cache.commit_and_bump(db)
     return {"status": "Deleted"}
 
 
@@ -454,12 +540,18 @@ def toggle_stock(item_id: int, s: AvailabilityUpdate, db: Session = Depends(get_
     item = db.query(models.MenuItem).filter(models.MenuItem.id == item_id).first()
     if item:
         item.is_available = s.is_available
-        db.commit()
+        menu_cache.commit_and_bump(db)
     return {"status": "Updated"}
 
 
+def order_event_payload(order: models.Order):
+    """Kitchen ticket fields pushed on the live stream (same shape as /kitchen-display/ rows)"""
+    return schemas.KitchenTicket.model_validate(order).model_dump(mode="json")
+
+
 @app.post("/order/")
-def place_order(order_data: OrderCreate, db: Session = Depends(get_db)):
+@query_budget.limit(6)
+async def place_order(order_data: OrderCreate, db: AsyncSession = Depends(get_async_db)):
     try:
         if not order_data.items or len(order_data.items) == 0:
             raise HTTPException(status_code=400, detail="No items in order")
@@ -468,9 +560,14 @@ def place_order(order_data: OrderCreate, db: Session = Depends(get_db)):
         discount_amount = 0.0
         summary_list = []
 
-        item_details = []
+        # Resolve every cart line in one batched lookup instead of one query per item
+        menu_ids = {item.menu_item_id for item in order_data.items}
+        menu_items = {m.id: m for m in (await db.execute(
+            select(models.MenuItem).where(models.MenuItem.id.in_(menu_ids)))).scalars()}
+
+        order_items = []
         for item in order_data.items:
-            menu_item = db.query(models.MenuItem).filter(models.MenuItem.id == item.menu_item_id).first()
+            menu_item = menu_items.get(item.menu_item_id)
             if not menu_item:
                 continue
             if not menu_item.is_available:
@@ -478,22 +575,19 @@ def place_order(order_data: OrderCreate, db: Session = Depends(get_db)):
             cost = menu_item.price * item.quantity
             subtotal += cost
             summary_list.append(f"{item.quantity}x {menu_item.name}")
-            item_details.append({
-                "name": menu_item.name, "qty": item.quantity, "price": menu_item.price,
-                "veg": menu_item.is_veg, "cat": menu_item.category
-            })
+            order_items.append({"item_name": menu_item.name, "quantity": item.quantity, "price": menu_item.price,
+                                "is_veg": menu_item.is_veg, "category": menu_item.category})
 
         if subtotal == 0:
             raise HTTPException(status_code=400, detail="Order total cannot be zero")
 
+        customer = None
         if order_data.customer_phone:
-            phone_clean = order_data.customer_phone.strip().replace(" ", "").replace("-", "")
-            customer = db.query(models.Customer).filter(models.Customer.phone == phone_clean).first()
+            customer = await db.run_sync(customer_cache.lookup, order_data.customer_phone)
             if customer:
                 if customer.discount_percent > 0:
                     discount_amount = round((subtotal * customer.discount_percent) / 100, 2)
-                customer.visit_count += 1
-                db.add(customer)
+                # The visit itself is counted once, at checkout (visit_counter)
 
         # Calculate GST (5%)
         gst_amount = round((subtotal - discount_amount) * 0.05, 2)
@@ -508,40 +602,59 @@ def place_order(order_data: OrderCreate, db: Session = Depends(get_db)):
             gst_amount=gst_amount,
             total_amount=final_total,
             items_summary=", ".join(summary_list),
-            customer_phone=order_data.customer_phone.strip() if order_data.customer_phone else None,
+            customer_phone=customer.phone if customer else None,  # FK: only numbers that exist in customers
             taken_by=order_data.taken_by,
             table_status="Occupied" if order_data.order_type == "Dine-in" else "Available"
         )
+        # Order + all its items in one transaction; the items go out as a single executemany INSERT
         db.add(new_order)
-        db.commit()
-        db.refresh(new_order)
-
-        for d in item_details:
-            db.add(models.OrderItem(order_id=new_order.id, item_name=d['name'], quantity=d['qty'], price=d['price'],
-                                    is_veg=d['veg'], category=d['cat']))
-
-        db.commit()
-        return {"status": "Placed", "id": new_order.id, "discount": discount_amount, "gst": gst_amount}
+        await db.flush()
+        order_id = new_order.id
+        kitchen_ticket = order_event_payload(new_order)
+        for row in order_items:
+            row["order_id"] = order_id
+        await db.execute(insert(models.OrderItem), order_items)
+        await db.run_sync(rollups.record_order, new_order.created_at, final_total,
+                          [(row["item_name"], row["quantity"]) for row in order_items])
+        await db.commit()
+        events.broker.publish(events.ORDER_CREATED, kitchen_ticket)
+        return {"status": "Placed", "id": order_id, "discount": discount_amount, "gst": gst_amount}
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"Order placement error: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to place order: {str(e)}")
 
 
 # --- 🔒 SECURE ORDER MANAGEMENT ---
 # Only staff can view kitchen display
-@app.get("/kitchen-display/")
-def kitchen_view(user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+@app.get("/kitchen-display/", response_model=List[schemas.KitchenTicket])
+@query_budget.limit(1)
+async def kitchen_view(user: StaffUser = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    if not user or user.role not in ["owner", "manager", "waiter", "chef"]:
+        raise HTTPException(status_code=401, detail="Not authorized")
+    rows = (await db.execute(select(*schemas.columns(models.Order, schemas.KitchenTicket)).where(
+        models.Order.status == "Pending"))).all()
+    return schemas.render(schemas.kitchen_tickets, rows)
+
+
+# Push stream for kitchen screens: order-created / order-completed / order-cancelled
+@app.get("/kitchen-display/stream")
+def kitchen_stream(request: Request, user: StaffUser = Depends(get_current_user)):
     if not user or user.role not in ["owner", "manager", "waiter", "chef"]:
         raise HTTPException(status_code=401, detail="Not authorized")
-    return db.query(models.Order).filter(models.Order.status == "Pending").all()
+    last_event_id = request.headers.get("last-event-id")
+    return StreamingResponse(
+        events.stream(request, int(last_event_id) if last_event_id and last_event_id.isdigit() else None),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # Only staff can complete orders
 @app.post("/order/{order_id}/done")
-def mark_done(order_id: int, user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+def mark_done(order_id: int, user: StaffUser = Depends(get_current_user), db: Session = Depends(get_db)):
     try:
         if not user or user.role not in ["owner", "manager", "chef", "waiter"]:
             raise HTTPException(status_code=401, detail="Not authorized")
@@ -555,6 +668,7 @@ def mark_done(order_id: int, user: models.User = Depends(get_current_user), db:
         
         order.status = "Completed"
         db.commit()
+        events.broker.publish(events.ORDER_COMPLETED, {"id": order_id})
         return {"status": "Done"}
     except HTTPException:
         raise
@@ -566,7 +680,7 @@ def mark_done(order_id: int, user: models.User = Depends(get_current_user), db:
 
 # Only Managers/Owners can cancel orders
 @app.post("/order/{order_id}/cancel")
-def cancel_order(order_id: int, user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+def cancel_order(order_id: int, user: StaffUser = Depends(get_current_user), db: Session = Depends(get_db)):
     try:
         if not user or user.role not in ["owner", "manager"]:
             raise HTTPException(status_code=401, detail="Not authorized")
@@ -582,7 +696,9 @@ def cancel_order(order_id: int, user: models.User = Depends(get_current_user), d
             raise HTTPException(status_code=400, detail="Cannot cancel paid order")
         
         order.status = "Cancelled"
+        rollups.remove_order(db, order)
         db.commit()
+        events.broker.publish(events.ORDER_CANCELLED, {"id": order_id})
         return {"status": "Cancelled"}
     except HTTPException:
         raise
@@ -592,20 +708,28 @@ def cancel_order(order_id: int, user: models.User = Depends(get_current_user), d
         raise HTTPException(status_code=500, detail=f"Failed to cancel order: {str(e)}")
 
 
-@app.get("/manager/orders/")
-def manager_orders(db: Session = Depends(get_db)):
+@app.get("/manager/orders/", response_model=schemas.ManagerOrders)
+@query_budget.limit(2)
+def manager_orders(cursor: Optional[str] = None, limit: Optional[int] = None, db: Session = Depends(get_db)):
     # Note: Ideally this should be secured too, but leaving open for manager.html fetch
     # If you want to secure manager.html fetch, you'd need to pass token in frontend fetch calls.
     # For now, we assume manager page is behind login gate, but API is technically open if token not checked.
     # Adding security here would require updating manager.html JS to send headers.
-    active = db.query(models.Order).filter(models.Order.status == "Pending").all()
-    history = db.query(models.Order).filter(models.Order.status != "Pending").order_by(
-        desc(models.Order.created_at)).limit(20).all()
-    return {"active": active, "history": history}
+    fields = schemas.columns(models.Order, schemas.ManagerOrder)
+    active = db.query(*fields).filter(models.Order.status == "Pending").all()
+    # History is paged newest first on (created_at, id); pass next_cursor back as ?cursor= for older orders
+    size = pagination.page_size(limit)
+    after = pagination.decode_cursor(cursor, datetime, int)
+    history = db.query(*fields).filter(
+        models.Order.status != "Pending",
+        pagination.keyset((models.Order.created_at, models.Order.id), after, descending=True)
+    ).order_by(desc(models.Order.created_at), desc(models.Order.id)).limit(size + 1).all()
+    history, next_cursor = pagination.page(history, size, lambda o: (o.created_at, o.id))
+    return schemas.render(schemas.manager_orders, {"active": active, "history": history, "next_cursor": next_cursor})
 
 
 @app.post("/manager/reset-history/")
-def reset_today_history(user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+def reset_today_history(user: StaffUser = Depends(get_current_user), db: Session = Depends(get_db)):
     """Reset order history - deletes today's completed/cancelled orders"""
     if not user or user.role not in ["manager", "owner"]:
         raise HTTPException(status_code=401, detail="Not authorized")
@@ -618,7 +742,8 @@ def reset_today_history(user: models.User = Depends(get_current_user), db: Sessi
             models.Order.status.in_(["Completed", "Cancelled"]),
             models.Order.created_at >= today_start
         ).delete()
-        
+        rollups.rebuild(db, since=today_start)
+
         db.commit()
         
         return {
@@ -635,55 +760,83 @@ def reset_today_history(user: models.User = Depends(get_current_user), db: Sessi
 # --- CUSTOMER CRM ---
 @app.post("/customers/")
 def add_customer(c: CustomerCreate, db: Session = Depends(get_db)):
-    existing = db.query(models.Customer).filter(models.Customer.phone == c.phone).first()
+    phone = customer_cache.normalize_phone(c.phone)
+    if not phone:
+        raise HTTPException(status_code=400, detail="Phone number required")
+    existing = db.query(models.Customer).filter(models.Customer.phone == phone).first()
     if existing:
         existing.name = c.name if c.name else None
         existing.relation = c.relation
         existing.discount_percent = c.discount_percent
+        version = customer_index.bump_version(db)
         db.commit()
+        customer_cache.invalidate(phone)
+        customer_index.apply(version, existing)
         return {"status": "Updated", "name": c.name or "Anonymous"}
     else:
         new_cust = models.Customer(
             name=c.name if c.name else None,
-            phone=c.phone,
+            phone=phone,
             relation=c.relation,
             discount_percent=c.discount_percent
         )
         db.add(new_cust)
+        version = customer_index.bump_version(db)
         db.commit()
+        customer_cache.invalidate(phone)
+        customer_index.apply(version, new_cust)
         return {"status": "Created", "name": c.name or "Anonymous"}
 
 
-@app.get("/customers/")
-def get_customers(search: Optional[str] = None, sort: str = "alpha", db: Session = Depends(get_db)):
-    query = db.query(models.Customer)
-    if search:
-        # Handle NULL names in search
-        query = query.filter(
-            (models.Customer.phone.contains(search)) |
-            (models.Customer.name.isnot(None) & models.Customer.name.contains(search))
-        )
-
-    # Sort alphabetically by name or by recent visits
-    if sort == "alpha":
-        # Sort by name, but put NULL names at the end
-        from sqlalchemy import case
-        query = query.order_by(
-            case((models.Customer.name.is_(None), 1), else_=0),
-            models.Customer.name
-        )
+@app.get("/customers/", response_model=schemas.CustomerPage)
+@query_budget.limit(3)
+def get_customers(search: Optional[str] = None, sort: str = "alpha", cursor: Optional[str] = None,
+                  limit: Optional[int] = None, db: Session = Depends(get_db)):
+    # Paged on (unnamed-last, name, id) for "alpha" and (created_at, id) newest first for "recent"
+    size = pagination.page_size(limit)
+    if sort == "recent":
+        after = pagination.decode_cursor(cursor, datetime, int)
+        key = lambda c: (c.created_at, c.id)
+    else:
+        after = pagination.decode_cursor(cursor, int, str, int)
+        key = lambda c: (1 if c.name is None else 0, c.name or "", c.id)
+
+    fields = schemas.columns(models.Customer, schemas.CustomerOut) + [models.Customer.created_at]
+    if search and len(search.strip()) >= customer_index.MIN_TERM_LENGTH:
+        # Phone prefix/suffix and name-word prefix matches come from the in-memory index;
+        # only one page of matching rows is loaded, by primary key. Shorter terms get the plain list.
+        ids = customer_index.search(db, search.strip(), sort, size + 1, after)
+        rows = {c.id: c for c in db.query(*fields).filter(models.Customer.id.in_(ids))} if ids else {}
+        customers = [rows[i] for i in ids if i in rows]
     elif sort == "recent":
-        query = query.order_by(desc(models.Customer.created_at))
-
-    return query.limit(100).all()
+        customers = db.query(*fields).filter(
+            pagination.keyset((models.Customer.created_at, models.Customer.id), after, descending=True)
+        ).order_by(desc(models.Customer.created_at), desc(models.Customer.id)).limit(size + 1).all()
+    else:
+        # Sort by name, but put NULL names at the end: named customers walk ix_customers_name_id,
+        # then unnamed ones continue by primary key (the cursor's first value says which part we are in)
+        customers = []
+        if after is None or after[0] == 0:
+            customers = db.query(*fields).filter(
+                models.Customer.name.isnot(None),
+                pagination.keyset((models.Customer.name, models.Customer.id), after and after[1:])
+            ).order_by(models.Customer.name, models.Customer.id).limit(size + 1).all()
+        if len(customers) <= size:
+            customers += db.query(*fields).filter(
+                models.Customer.name.is_(None),
+                models.Customer.id > (after[2] if after and after[0] == 1 else 0)
+            ).order_by(models.Customer.id).limit(size + 1 - len(customers)).all()
+
+    customers, next_cursor = pagination.page(customers, size, key)
+    return schemas.render(schemas.customer_page, {"items": customers, "next_cursor": next_cursor})
 
 
 @app.get("/customers/lookup/{phone}")
+@query_budget.limit(1)
 def lookup_customer(phone: str, db: Session = Depends(get_db)):
     """Lookup customer by phone number for real-time checkout"""
     try:
-        phone_clean = phone.strip().replace(" ", "").replace("-", "")
-        customer = db.query(models.Customer).filter(models.Customer.phone == phone_clean).first()
+        customer = customer_cache.lookup(db, phone)
         if customer:
             return {
                 "exists": True,
@@ -706,8 +859,17 @@ def add_inv(req: InventoryCreate, db: Session = Depends(get_db)):
     return {"status": "OK"}
 
 
-@app.get("/inventory/")
-def get_inv(db: Session = Depends(get_db)): return db.query(models.InventoryRequest).all()
+@app.get("/inventory/", response_model=schemas.InventoryPage)
+@query_budget.limit(1)
+def get_inv(cursor: Optional[str] = None, limit: Optional[int] = None, db: Session = Depends(get_db)):
+    # Oldest request first, paged on (created_at, id)
+    size = pagination.page_size(limit)
+    after = pagination.decode_cursor(cursor, datetime, int)
+    requests = db.query(*schemas.columns(models.InventoryRequest, schemas.InventoryRequestOut)).filter(
+        pagination.keyset((models.InventoryRequest.created_at, models.InventoryRequest.id), after)
+    ).order_by(models.InventoryRequest.created_at, models.InventoryRequest.id).limit(size + 1).all()
+    requests, next_cursor = pagination.page(requests, size, lambda r: (r.created_at, r.id))
+    return schemas.render(schemas.inventory_page, {"items": requests, "next_cursor": next_cursor})
 
 
 @app.delete("/inventory/")
@@ -719,29 +881,37 @@ def clear_inv(db: Session = Depends(get_db)):
 
 # --- OWNER ANALYTICS ---
 @app.get("/owner/analytics/")
-def owner_analytics(db: Session = Depends(get_db)):
+@query_budget.limit(3)
+async def owner_analytics(db: AsyncSession = Depends(get_async_db)):
+    # Reads the hourly rollups (rollups.py), never the raw orders table
     now = datetime.utcnow()
     today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
     week_start = today_start - timedelta(days=7)
     month_start = today_start - timedelta(days=30)
 
-    def get_rev(date_limit):
-        return db.query(func.sum(models.Order.total_amount)).filter(
-            models.Order.created_at >= date_limit).scalar() or 0.0
+    hour = models.SalesHourly.hour_start
+    revenue = models.SalesHourly.revenue
 
-    best_sellers_month = db.query(models.OrderItem.item_name,
-                                  func.sum(models.OrderItem.quantity).label('total_qty')).join(models.Order).filter(
-        models.Order.created_at >= month_start).group_by(models.OrderItem.item_name).order_by(desc('total_qty')).limit(
-        5).all()
-    total_rev_month = get_rev(month_start)
-    total_orders_month = db.query(models.Order).filter(models.Order.created_at >= month_start).count()
+    def since(date_limit, column):
+        return func.coalesce(func.sum(case((hour >= date_limit, column), else_=0)), 0)
+
+    rev_today, rev_week, total_rev_month, total_orders_month, rev_total = (await db.execute(select(
+        since(today_start, revenue), since(week_start, revenue), since(month_start, revenue),
+        since(month_start, models.SalesHourly.order_count), func.coalesce(func.sum(revenue), 0.0)
+    ))).one()
+
+    best_sellers_month = (await db.execute(select(
+        models.ItemSalesHourly.item_name, func.sum(models.ItemSalesHourly.quantity).label('total_qty')).where(
+        models.ItemSalesHourly.hour_start >= month_start).group_by(models.ItemSalesHourly.item_name).having(
+        func.sum(models.ItemSalesHourly.quantity) > 0).order_by(desc('total_qty')).limit(5))).all()
     aov = round(total_rev_month / total_orders_month, 2) if total_orders_month > 0 else 0
-    peak_hours = db.query(extract('hour', models.Order.created_at).label('h'),
-                          func.count(models.Order.id).label('cnt')).group_by('h').order_by(desc('cnt')).limit(3).all()
+    peak_hours = (await db.execute(select(
+        extract('hour', hour).label('h'), func.sum(models.SalesHourly.order_count).label('cnt')).group_by(
+        'h').order_by(desc('cnt')).limit(3))).all()
 
     return {
-        "revenue": {"today": get_rev(today_start), "week": get_rev(week_start), "month": total_rev_month,
-                    "total": db.query(func.sum(models.Order.total_amount)).scalar() or 0.0},
+        "revenue": {"today": round(rev_today, 2), "week": round(rev_week, 2), "month": round(total_rev_month, 2),
+                    "total": round(rev_total, 2)},
         "best_sellers_month": [{"name": b[0], "qty": b[1]} for b in best_sellers_month],
         "advanced": {"aov": aov, "peak_hours": [{"hour": h[0], "count": h[1]} for h in peak_hours]}
     }
@@ -749,19 +919,26 @@ def owner_analytics(db: Session = Depends(get_db)):
 
 # --- TABLE MANAGEMENT ---
 @app.get("/manager/tables/")
-def get_table_status(db: Session = Depends(get_db)):
-    """Get real-time status of all 10 tables"""
-    tables_data = []
-
-    for table_num in range(1, 11):
-        # Find the most recent order for this table that's still pending (not paid)
-        active_order = db.query(models.Order).filter(
-            models.Order.table_number == table_num,
-            models.Order.order_type == "Dine-in",
-            models.Order.status.in_(["Pending", "Completed"]),
-            models.Order.payment_method.is_(None)  # Not yet paid
-        ).order_by(desc(models.Order.created_at)).first()
+@query_budget.limit(1)
+async def get_table_status(db: AsyncSession = Depends(get_async_db)):
+    """Get real-time status of every table in the floor plan (one query for all tables)"""
+    # Most recent unpaid Dine-in order per table, ranked in the DB instead of one query per table
+    ranked = select(
+        models.Order.table_number, models.Order.id, models.Order.total_amount,
+        models.Order.items_summary, models.Order.created_at,
+        func.row_number().over(partition_by=models.Order.table_number,
+                               order_by=desc(models.Order.created_at)).label("rn")
+    ).where(
+        models.Order.table_number.in_(TABLE_NUMBERS),
+        models.Order.order_type == "Dine-in",
+        models.Order.status.in_(["Pending", "Completed"]),
+        models.Order.payment_method.is_(None)  # Not yet paid
+    ).subquery()
+    active_orders = {row.table_number: row for row in (await db.execute(select(ranked).where(ranked.c.rn == 1)))}
 
+    tables_data = []
+    for table_num in TABLE_NUMBERS:
+        active_order = active_orders.get(table_num)
         if active_order:
             tables_data.append({
                 "table_number": table_num,
@@ -795,32 +972,36 @@ class CheckoutSchema(BaseModel):
 
 
 @app.post("/manager/checkout/")
-def checkout_order(checkout: CheckoutSchema, db: Session = Depends(get_db)):
+@query_budget.limit(11)  # worst case: new customer + discount on an order from a closed day
+async def checkout_order(checkout: CheckoutSchema, db: AsyncSession = Depends(get_async_db)):
     """Process payment with discount recalculation and customer management"""
     try:
-        order = db.query(models.Order).filter(models.Order.id == checkout.order_id).first()
+        order = await db.get(models.Order, checkout.order_id)
         if not order:
             raise HTTPException(status_code=404, detail="Order not found")
 
         if order.payment_method:
             raise HTTPException(status_code=400, detail="Order already paid")
 
+        billed_total = order.total_amount
+
         # Handle customer lookup and discount recalculation
         discount_to_apply = 0.0
         customer = None
+        index_version = None
+        visitor_id = None  # existing customer whose visit this checkout counts
         
         if checkout.customer_phone:
-            # Clean phone number
-            phone_clean = checkout.customer_phone.strip().replace(" ", "").replace("-", "")
+            phone_clean = customer_cache.normalize_phone(checkout.customer_phone)
             
-            # Lookup existing customer
-            customer = db.query(models.Customer).filter(models.Customer.phone == phone_clean).first()
+            # Lookup existing customer (usually already cached by the manager's /customers/lookup call)
+            customer = await db.run_sync(customer_cache.lookup, phone_clean)
             
             if customer:
                 # Existing customer - use their discount
                 if customer.discount_percent > 0:
                     discount_to_apply = (order.subtotal * customer.discount_percent) / 100
-                customer.visit_count += 1
+                visitor_id = customer.id
             else:
                 # New customer - always create entry (to satisfy foreign key constraint)
                 # Per requirement: "every number stored in our database with or without name"
@@ -833,8 +1014,10 @@ def checkout_order(checkout: CheckoutSchema, db: Session = Depends(get_db)):
                         discount_percent=float(checkout.customer_discount) if (checkout.save_customer and checkout.customer_discount) else 0.0,
                         relation="Regular"
                     )
-                    db.add(customer)
-                    db.flush()  # Flush to ensure customer is in database before setting foreign key
+                    # Savepoint: a duplicate-phone race only rolls back this insert, not the checkout
+                    async with db.begin_nested():
+                        db.add(customer)  # Flushed on exit so the customer exists before setting the foreign key
+                    index_version = await db.run_sync(customer_index.bump_version)
                     
                     # Apply discount if provided
                     if checkout.customer_discount and float(checkout.customer_discount) > 0:
@@ -842,7 +1025,8 @@ def checkout_order(checkout: CheckoutSchema, db: Session = Depends(get_db)):
                 except Exception as e:
                     # If customer creation fails (e.g., duplicate phone from race condition), try to fetch again
                     print(f"Customer creation failed, retrying lookup: {e}")
-                    customer = db.query(models.Customer).filter(models.Customer.phone == phone_clean).first()
+                    customer_cache.invalidate(phone_clean)  # drop the cached "no such customer"
+                    customer = await db.run_sync(customer_cache.lookup, phone_clean)
                     if not customer:
                         # If still no customer, we can't set the foreign key - skip setting customer_phone
                         print(f"Warning: Could not create or find customer with phone {phone_clean}, skipping customer_phone assignment")
@@ -858,14 +1042,31 @@ def checkout_order(checkout: CheckoutSchema, db: Session = Depends(get_db)):
             # Only set customer_phone if customer exists in database (satisfies foreign key constraint)
             if phone_clean and customer:
                 order.customer_phone = phone_clean
+        elif order.customer_phone:
+            # Phone was given when the order was placed rather than at the counter
+            regular = await db.run_sync(customer_cache.lookup, order.customer_phone)
+            visitor_id = regular.id if regular else None
 
         # Mark as paid
         order.payment_method = checkout.payment_method
         order.paid_at = datetime.utcnow()
         order.table_status = "Available"
         order.status = "Completed"  # Also mark order as completed
-
-        db.commit()
+        await db.run_sync(rollups.adjust_revenue, order.created_at, order.total_amount - billed_total)
+        repriced_day = order.created_at if order.total_amount != billed_total else None
+        if repriced_day and history_cache.is_closed(
+                repriced_day.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)):
+            await db.run_sync(history_cache.bump_version)  # other workers drop their cached summaries
+
+        await db.commit()
+        if visitor_id:
+            visit_counter.record(visitor_id)
+        if index_version:
+            customer_cache.invalidate(phone_clean)
+            await run_in_threadpool(customer_index.apply, index_version, customer)  # copies the index
+        if repriced_day:
+            history_cache.invalidate(repriced_day)  # late checkout of an order from a closed day
+        events.broker.publish(events.ORDER_COMPLETED, {"id": checkout.order_id})
 
         return {
             "status": "Payment Successful",
@@ -877,13 +1078,15 @@ def checkout_order(checkout: CheckoutSchema, db: Session = Depends(get_db)):
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"Checkout error: {e}")
         raise HTTPException(status_code=500, detail=f"Checkout failed: {str(e)}")
 
 
 @app.get("/owner/history/")
-def get_history(date: Optional[str] = None, month: Optional[str] = None, db: Session = Depends(get_db)):
+@query_budget.limit(4)
+def get_history(date: Optional[str] = None, month: Optional[str] = None, cursor: Optional[str] = None,
+                limit: Optional[int] = None, db: Session = Depends(get_db)):
     start_dt = None
     end_dt = None
     if date:
@@ -899,26 +1102,62 @@ def get_history(date: Optional[str] = None, month: Optional[str] = None, db: Ses
     else:
         raise HTTPException(400, "Date needed")
 
-    revenue = db.query(func.sum(models.Order.total_amount)).filter(models.Order.created_at >= start_dt,
-                                                                   models.Order.created_at < end_dt).scalar() or 0.0
-    veg_count = db.query(func.sum(models.OrderItem.quantity)).join(models.Order).filter(
-        models.Order.created_at >= start_dt, models.Order.created_at < end_dt,
-        models.OrderItem.is_veg == True).scalar() or 0
-    non_veg_count = db.query(func.sum(models.OrderItem.quantity)).join(models.Order).filter(
-        models.Order.created_at >= start_dt, models.Order.created_at < end_dt,
-        models.OrderItem.is_veg == False).scalar() or 0
-    all_items = db.query(models.OrderItem.item_name, func.sum(models.OrderItem.quantity).label("qty")).join(
-        models.Order).filter(models.Order.created_at >= start_dt, models.Order.created_at < end_dt).group_by(
-        models.OrderItem.item_name).order_by(desc("qty")).all()
-
-    detailed_logs = []
+    in_range = [models.Order.created_at >= start_dt, models.Order.created_at < end_dt]
+
+    # Detailed log (single day only): newest first, paged on (created_at, id)
+    detailed_logs, next_cursor = [], None
     if date:
-        orders = db.query(models.Order).filter(models.Order.created_at >= start_dt,
-                                               models.Order.created_at < end_dt).order_by(
-            desc(models.Order.created_at)).all()
+        size = pagination.page_size(limit)
+        after = pagination.decode_cursor(cursor, datetime, int)
+        orders = db.query(models.Order.id, models.Order.created_at, models.Order.order_type, models.Order.table_number,
+                          models.Order.items_summary, models.Order.total_amount, models.Order.taken_by).filter(
+            *in_range, pagination.keyset((models.Order.created_at, models.Order.id), after, descending=True)
+        ).order_by(desc(models.Order.created_at), desc(models.Order.id)).limit(size + 1).all()
+        orders, next_cursor = pagination.page(orders, size, lambda o: (o.created_at, o.id))
         for o in orders: detailed_logs.append(
             {"id": o.id, "time": o.created_at.strftime("%I:%M %p"), "type": o.order_type, "table": o.table_number,
              "items": o.items_summary, "total": o.total_amount, "taken_by": o.taken_by})
 
-    return {"revenue": revenue, "veg_sold": veg_count, "non_veg_sold": non_veg_count,
-            "items": [{"name": i[0], "qty": i[1]} for i in all_items], "detailed_logs": detailed_logs}
\ No newline at end of file
+    # Closed days/months never change, so their summaries are computed once
+    cache_key = (start_dt, end_dt)
+    closed = history_cache.is_closed(end_dt)
+    version = history_cache.current_version(db) if closed else None
+    summary = history_cache.get(cache_key) if closed else None
+    if summary is None:
+        revenue = db.query(func.sum(models.Order.total_amount)).filter(*in_range).scalar() or 0.0
+
+        # One pass over the items: per-item totals plus veg/non-veg split via conditional sums
+        all_items = db.query(
+            models.OrderItem.item_name,
+            func.sum(models.OrderItem.quantity).label("qty"),
+            func.sum(case((models.OrderItem.is_veg == True, models.OrderItem.quantity), else_=0)).label("veg"),
+            func.sum(case((models.OrderItem.is_veg == False, models.OrderItem.quantity), else_=0)).label("non_veg")
+        ).join(models.Order).filter(*in_range).group_by(models.OrderItem.item_name).order_by(desc("qty")).all()
+        veg_count = sum(i.veg or 0 for i in all_items)
+        non_veg_count = sum(i.non_veg or 0 for i in all_items)
+
+        summary = {"revenue": revenue, "veg_sold": veg_count, "non_veg_sold": non_veg_count,
+                   "items": [{"name": i[0], "qty": i[1]} for i in all_items]}
+        if closed:
+            history_cache.put(cache_key, summary, version)
+    return {**summary, "detailed_logs": detailed_logs, "next_cursor": next_cursor}
+
+
+# Accountant export: orders + line items for a date range, streamed (see export.py)
+@app.get("/owner/export/")
+def export_orders(start: str, end: Optional[str] = None, format: str = "csv",
+                  user: StaffUser = Depends(get_current_user)):
+    if not user or user.role != "owner":
+        raise HTTPException(status_code=401, detail="Not authorized")
+    if format not in export.FORMATS:
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    try:
+        start_dt, end_dt = export.date_range(start, end)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Use start/end dates as YYYY-MM-DD, end not before start")
+    filename = f"orders_{start}_{end or start}.{format}"
+    return StreamingResponse(
+        export.stream(start_dt, end_dt, format),
+        media_type=export.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "X-Accel-Buffering": "no"},
+    )
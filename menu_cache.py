@@ -0,0 +1,87 @@
+"""
+Process-local menu snapshot served by GET /menu/.
+
+The whole menu is serialized to JSON bytes once (schemas.MenuItemOut) and
+tagged with a strong ETag (hash of the body). Writers call `commit_and_bump(db)` instead of
+`db.commit()`, which bumps the shared version row in `cache_versions` and
+drops this process's snapshot. Other workers/processes (e.g. reset_menu.py)
+are picked up by re-checking that row at most every VERSION_CHECK_SECONDS.
+"""
+import hashlib
+import os
+import threading
+import time
+
+import models
+import schemas
+
+MENU_KEY = "menu"
+VERSION_CHECK_SECONDS = float(os.getenv("MENU_VERSION_CHECK_SECONDS", "5"))
+
+_lock = threading.Lock()
+_snapshot = None   # {"version", "etag", "body"}
+_checked_at = 0.0
+_generation = 0    # bumped by invalidate(); a rebuild that raced with it is not stored
+
+
+def peek():
+    """The snapshot if it is still within its version-check window, else None (never touches the DB)."""
+    snap = _snapshot
+    if snap is not None and time.monotonic() - _checked_at < VERSION_CHECK_SECONDS:
+        return snap
+    return None
+
+
+def get_snapshot(db):
+    """Return the current menu snapshot; only touches the DB when the version check is due or the menu changed."""
+    global _snapshot, _checked_at
+    snap = peek()
+    if snap is not None:
+        return snap
+
+    # No lock held during the queries: this also runs inside AsyncSession.run_sync on the event
+    # loop thread, where blocking on a lock held by a suspended coroutine would deadlock.
+    # Two concurrent rebuilds just do the same work twice.
+    # Read the version first: if a write lands in between we load newer rows
+    # under an older version, and simply reload on the next check.
+    generation = _generation
+    version = models.read_version(db, MENU_KEY)
+    snap = _snapshot
+    if snap is None or snap["version"] != version:
+        rows = db.query(*schemas.columns(models.MenuItem, schemas.MenuItemOut)).order_by(models.MenuItem.id).all()
+        body = schemas.dump(schemas.menu_items, rows)
+        snap = {
+            "version": version,
+            "etag": '"' + hashlib.sha256(body).hexdigest()[:32] + '"',
+            "body": body,
+        }
+    with _lock:
+        if generation == _generation:
+            _snapshot = snap
+            _checked_at = time.monotonic()
+    return snap
+
+
+def invalidate():
+    global _snapshot, _generation
+    with _lock:
+        _snapshot = None
+        _generation += 1
+
+
+def commit_and_bump(db):
+    """Commit the caller's menu changes together with a version bump, then drop the local snapshot."""
+    models.bump_version(db, MENU_KEY)
+    db.commit()
+    invalidate()
+
+
+def etag_matches(if_none_match, etag):
+    """RFC 7232 If-None-Match check (weak comparison, '*' matches anything)."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
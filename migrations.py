@@ -0,0 +1,165 @@
+"""
+Versioned schema migrations.
+
+Runs once at app startup (see main.lifespan) and can also be run by hand:
+
+    python migrations.py
+
+Every migration has a version number and is recorded in the
+`schema_migrations` table once applied, so re-running is always safe.
+To change the schema, append a new migration at the bottom - never edit
+one that has already shipped.
+"""
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+
+from sqlalchemy.orm import Session
+
+from database import engine, db_state
+import models
+
+# Seconds to wait before retrying the bootstrap after the DB was unreachable
+BOOTSTRAP_RETRY_SECONDS = 15
+
+_bootstrap_lock = threading.Lock()
+
+_meta = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _meta,
+    Column("version", Integer, primary_key=True),
+    Column("description", String),
+    Column("applied_at", DateTime, default=datetime.utcnow),
+)
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """Register a migration function `fn(conn)` under a version number."""
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return register
+
+
+def _add_column_if_missing(conn, table, column, ddl):
+    existing = {c["name"] for c in inspect(conn).get_columns(table)}
+    if column not in existing:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+# --- MIGRATIONS ---
+@migration(1, "Create base tables")
+def _create_base_tables(conn):
+    models.Base.metadata.create_all(bind=conn)
+
+
+@migration(2, "Add GST, payment and table status columns to orders")
+def _add_order_billing_columns(conn):
+    _add_column_if_missing(conn, "orders", "gst_amount", "FLOAT DEFAULT 0.0")
+    _add_column_if_missing(conn, "orders", "payment_method", "VARCHAR")
+    _add_column_if_missing(conn, "orders", "paid_at", "TIMESTAMP")
+    _add_column_if_missing(conn, "orders", "table_status", "VARCHAR DEFAULT 'Occupied'")
+
+
+@migration(3, "Add cache_versions table for the menu cache")
+def _add_cache_versions(conn):
+    models.CacheVersion.__table__.create(bind=conn, checkfirst=True)
+    if not conn.execute(text("SELECT 1 FROM cache_versions WHERE name = 'menu'")).first():
+        conn.execute(text("INSERT INTO cache_versions (name, version) VALUES ('menu', 1)"))
+
+
+@migration(4, "Add hourly sales rollup tables and backfill them")
+def _add_sales_rollups(conn):
+    import rollups
+    models.SalesHourly.__table__.create(bind=conn, checkfirst=True)
+    models.ItemSalesHourly.__table__.create(bind=conn, checkfirst=True)
+    with Session(bind=conn) as db:
+        rollups.rebuild(db)
+
+
+@migration(5, "Add indexes for the hot order queries")
+def _add_hot_order_indexes(conn):
+    for index in list(models.Order.__table__.indexes) + list(models.OrderItem.__table__.indexes):
+        index.create(bind=conn, checkfirst=True)
+
+
+@migration(6, "Add (created_at, id) indexes for keyset pagination")
+def _add_keyset_indexes(conn):
+    for index in list(models.Customer.__table__.indexes) + list(models.InventoryRequest.__table__.indexes):
+        index.create(bind=conn, checkfirst=True)
+
+
+@migration(7, "Add revoked_sessions table for server-side logout")
+def _add_revoked_sessions(conn):
+    models.RevokedSession.__table__.create(bind=conn, checkfirst=True)
+
+
+@migration(8, "Add (name, id) index for the alphabetical customer list")
+def _add_customer_name_index(conn):
+    for index in models.Customer.__table__.indexes:
+        index.create(bind=conn, checkfirst=True)
+
+
+# --- RUNNER ---
+def run_migrations(bind=engine):
+    """Apply every pending migration, each in its own transaction. Returns the versions applied."""
+    _meta.create_all(bind=bind)
+    with bind.connect() as conn:
+        done = {row[0] for row in conn.execute(select(schema_migrations.c.version))}
+
+    applied = []
+    for version, description, fn in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if version in done:
+            continue
+        with bind.begin() as conn:
+            fn(conn)
+            conn.execute(schema_migrations.insert().values(
+                version=version, description=description, applied_at=datetime.utcnow()))
+        print(f"   Applied migration {version}: {description}")
+        applied.append(version)
+    return applied
+
+
+def bootstrap_schema():
+    """
+    Bring the schema up to date and flip the readiness flag.
+    Never raises: on failure the app keeps serving static pages and
+    DB-backed routes answer 503 until a later retry succeeds.
+    """
+    db_state["last_attempt"] = time.monotonic()
+    try:
+        run_migrations()
+        db_state["ready"] = True
+        db_state["last_error"] = None
+        print("✅ Database connection successful - Schema up to date")
+    except Exception as e:
+        db_state["ready"] = False
+        db_state["last_error"] = str(e)
+        print(f"⚠️ WARNING: Database bootstrap failed: {e}")
+    return db_state["ready"]
+
+
+def ensure_schema():
+    """Cheap readiness check for the request path; retries the bootstrap at most every BOOTSTRAP_RETRY_SECONDS."""
+    if db_state["ready"]:
+        return True
+    last = db_state["last_attempt"]
+    if last is not None and time.monotonic() - last < BOOTSTRAP_RETRY_SECONDS:
+        return False
+    # Only one request retries; everyone else fails fast while it runs
+    if not _bootstrap_lock.acquire(blocking=False):
+        return False
+    try:
+        return bootstrap_schema()
+    finally:
+        _bootstrap_lock.release()
+
+
+if __name__ == "__main__":
+    print("Starting migrations...")
+    versions = run_migrations()
+    print(f"Done. Applied {len(versions)} migration(s).")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, Float, DateTime, ForeignKey, Index, text, update
 from sqlalchemy.orm import relationship
 from database import Base
 import datetime
@@ -9,7 +9,7 @@ class User(Base):
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, unique=True, index=True)
     password_hash = Column(String)
-    role = Column(String)  # "owner", "manager", "waiter"
+    role = Column(String)  # "owner", "manager", "waiter", "chef"
 
 
 class MenuItem(Base):
@@ -34,6 +34,12 @@ class Customer(Base):
     visit_count = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
 
+    # Keyset pages of /customers/: sort=recent (migration 6) and sort=alpha (migration 8)
+    __table_args__ = (
+        Index("ix_customers_created_at_id", "created_at", "id"),
+        Index("ix_customers_name_id", "name", "id"),
+    )
+
 
 class Order(Base):
     __tablename__ = "orders"
@@ -61,11 +67,23 @@ class Order(Base):
 
     items = relationship("OrderItem", back_populates="order")
 
+    # Hot-path indexes (added to existing DBs by migration 5; verified by index_check.py)
+    __table_args__ = (
+        # Analytics backfill, history, reset: created_at ranges
+        Index("ix_orders_created_at", "created_at"),
+        # Kitchen display / manager active list (status = 'Pending'), reset (status IN ... AND created_at >=)
+        Index("ix_orders_status_created_at", "status", "created_at"),
+        # Table occupancy: latest unpaid Dine-in order per table (status leads so both IN filters seek)
+        Index("ix_orders_open_dine_in", "status", "table_number", "created_at",
+              postgresql_where=text("payment_method IS NULL AND order_type = 'Dine-in'"),
+              sqlite_where=text("payment_method IS NULL AND order_type = 'Dine-in'")),
+    )
+
 
 class OrderItem(Base):
     __tablename__ = "order_items"
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"))
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True)  # receipts, history/analytics joins
     item_name = Column(String)
     quantity = Column(Integer)
     price = Column(Float)
@@ -79,4 +97,54 @@ class InventoryRequest(Base):
     __tablename__ = "inventory_requests"
     id = Column(Integer, primary_key=True, index=True)
     item_name = Column(String)
-    created_at = Column(DateTime, default=datetime.datetime.utcnow)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    # Keyset pages of /inventory/ (migration 6)
+    __table_args__ = (Index("ix_inventory_requests_created_at_id", "created_at", "id"),)
+
+
+class RevokedSession(Base):
+    """Logged-out sessions: their refresh tokens are refused until they would have expired anyway"""
+    __tablename__ = "revoked_sessions"
+    sid = Column(String, primary_key=True)  # "sid" claim shared by a login's access/refresh tokens
+    expires_at = Column(DateTime, index=True)
+
+
+class CacheVersion(Base):
+    """Shared version counters so every worker/process can tell when a cached snapshot is stale"""
+    __tablename__ = "cache_versions"
+    name = Column(String, primary_key=True)  # e.g. "menu"
+    version = Column(Integer, default=0)
+
+
+def read_version(db, name):
+    """Current value of a cache version counter (0 until first bumped)."""
+    row = db.query(CacheVersion.version).filter(CacheVersion.name == name).first()
+    return row[0] if row else 0
+
+
+def bump_version(db, name):
+    """Increment a cache version counter inside the caller's transaction, creating the row on first use."""
+    bumped = db.execute(
+        update(CacheVersion).where(CacheVersion.name == name).values(version=CacheVersion.version + 1)
+    ).rowcount
+    if not bumped:
+        db.add(CacheVersion(name=name, version=1))
+        db.flush()
+
+
+# --- SALES ROLLUPS (maintained by rollups.py) ---
+class SalesHourly(Base):
+    """Revenue and order count per UTC hour, keyed by the orders' created_at hour"""
+    __tablename__ = "sales_hourly"
+    hour_start = Column(DateTime, primary_key=True)
+    revenue = Column(Float, default=0.0)
+    order_count = Column(Integer, default=0)
+
+
+class ItemSalesHourly(Base):
+    """Quantity sold per menu item per UTC hour"""
+    __tablename__ = "item_sales_hourly"
+    hour_start = Column(DateTime, primary_key=True)
+    item_name = Column(String, primary_key=True)
+    quantity = Column(Integer, default=0)
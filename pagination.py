@@ -0,0 +1,61 @@
+"""
+Keyset (cursor) pagination for the list endpoints.
+
+Every paged list is ordered by a sort key that ends in the primary key, e.g.
+(created_at, id). A page holds `limit` rows plus an opaque `next_cursor`
+(the last row's key), and the next page is the index range
+`WHERE (created_at, id) < (:created_at, :id)`. That makes page 500 as cheap
+as page 1 and stable while new rows arrive, unlike OFFSET.
+
+    rows = query.filter(keyset((Order.created_at, Order.id), cursor_values, descending=True))
+                .order_by(desc(Order.created_at), desc(Order.id)).limit(size + 1).all()
+    rows, next_cursor = page(rows, size, lambda o: (o.created_at, o.id))
+"""
+import base64
+import json
+import os
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import true, tuple_
+
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = 500
+
+
+def page_size(limit=None):
+    return PAGE_SIZE if limit is None else max(1, min(int(limit), MAX_PAGE_SIZE))
+
+
+def encode_cursor(*values):
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, *types):
+    """Values of a cursor from encode_cursor, converted to `types` (None if no cursor); 400 if it is malformed."""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if len(values) != len(types):
+            raise ValueError("wrong cursor length")
+        return tuple(datetime.fromisoformat(v) if t is datetime else t(v) for t, v in zip(types, values))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset(columns, values, descending=False):
+    """WHERE clause for rows after `values` in (columns) order; a no-op when values is None."""
+    if values is None:
+        return true()
+    key = tuple_(*columns)
+    return key < tuple_(*values) if descending else key > tuple_(*values)
+
+
+def page(rows, size, key):
+    """Trim a `size + 1` fetch to `size` rows; returns (rows, next_cursor or None)."""
+    if len(rows) <= size:
+        return rows, None
+    rows = rows[:size]
+    return rows, encode_cursor(*key(rows[-1]))
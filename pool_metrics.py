@@ -0,0 +1,103 @@
+"""
+Connection pool instrumentation.
+
+database.py builds its engines with the Timed* pool classes below, which
+time how long each checkout waits for a free connection. `render()`
+returns Prometheus text for /metrics: wait-time histogram, timeouts,
+and current size / checked-out / saturation per pool. A saturation near 1
+with a growing wait histogram means the pool is the bottleneck.
+"""
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_sum = 0.0
+        self.buckets = [0] * len(WAIT_BUCKETS)
+
+    def observe(self, seconds, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.wait_sum += seconds
+            for i, bound in enumerate(WAIT_BUCKETS):
+                if seconds <= bound:
+                    self.buckets[i] += 1
+
+
+def _timed(pool_cls):
+    class Timed(pool_cls):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.wait_stats = PoolStats()
+
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                conn = super()._do_get()
+            except PoolTimeoutError:
+                self.wait_stats.observe(0, timed_out=True)
+                raise
+            self.wait_stats.observe(time.perf_counter() - start)
+            return conn
+
+    Timed.__name__ = "Timed" + pool_cls.__name__
+    return Timed
+
+
+TimedQueuePool = _timed(QueuePool)
+TimedAsyncAdaptedQueuePool = _timed(AsyncAdaptedQueuePool)
+
+_engines = {}  # label -> sync Engine (pass async_engine.sync_engine for async engines)
+
+
+def register(label, engine, max_overflow):
+    """Export engine's pool; max_overflow is the configured value (database.POOL_MAX_OVERFLOW)."""
+    _engines[label] = (engine, max_overflow)
+
+
+def render():
+    """Prometheus exposition text for every registered pool."""
+    lines = [
+        "# HELP db_pool_checkout_wait_seconds Time spent waiting for a pooled DB connection",
+        "# TYPE db_pool_checkout_wait_seconds histogram",
+    ]
+    gauges = []
+    for label, (engine, max_overflow) in _engines.items():
+        pool = engine.pool
+        stats = getattr(pool, "wait_stats", None)
+        if stats is None:
+            continue
+        with stats._lock:
+            for bound, count in zip(WAIT_BUCKETS, stats.buckets):  # observe() already counts cumulatively
+                lines.append(f'db_pool_checkout_wait_seconds_bucket{{pool="{label}",le="{bound}"}} {count}')
+            lines.append(f'db_pool_checkout_wait_seconds_bucket{{pool="{label}",le="+Inf"}} {stats.checkouts}')
+            lines.append(f'db_pool_checkout_wait_seconds_sum{{pool="{label}"}} {stats.wait_sum:.6f}')
+            lines.append(f'db_pool_checkout_wait_seconds_count{{pool="{label}"}} {stats.checkouts}')
+            timeouts = stats.timeouts
+        capacity = pool.size() + max(max_overflow, 0)
+        checked_out = pool.checkedout()
+        gauges.append((label, timeouts, pool.size(), checked_out, checked_out / capacity if capacity else 0.0))
+
+    lines += ["# HELP db_pool_checkout_timeouts_total Checkouts that gave up after pool_timeout",
+              "# TYPE db_pool_checkout_timeouts_total counter"]
+    lines += [f'db_pool_checkout_timeouts_total{{pool="{g[0]}"}} {g[1]}' for g in gauges]
+    lines += ["# HELP db_pool_size Configured pool size", "# TYPE db_pool_size gauge"]
+    lines += [f'db_pool_size{{pool="{g[0]}"}} {g[2]}' for g in gauges]
+    lines += ["# HELP db_pool_checked_out Connections currently in use", "# TYPE db_pool_checked_out gauge"]
+    lines += [f'db_pool_checked_out{{pool="{g[0]}"}} {g[3]}' for g in gauges]
+    lines += ["# HELP db_pool_saturation Connections in use / (pool_size + max_overflow)",
+              "# TYPE db_pool_saturation gauge"]
+    lines += [f'db_pool_saturation{{pool="{g[0]}"}} {g[4]:.3f}' for g in gauges]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,141 @@
+"""
+Query budgets: catch N+1 patterns before they reach production.
+
+    # scripts / tests: count every statement on the app's engines, from any thread
+    with QueryBudget(2, "kitchen display"):
+        client.get("/kitchen-display/")
+
+    # endpoints: declare what a request may cost
+    @app.get("/kitchen-display/")
+    @limit(1)
+    async def kitchen_view(...): ...
+
+A blown budget raises QueryBudgetExceeded listing the statements, with
+repeated ones (the N+1 signature) first. `@limit` only counts the endpoint
+body's own queries (dependencies like auth are excluded); set it from the
+endpoint's worst-case path. It raises under QUERY_DEBUG=1 and just prints
+in production, and it never raises once the endpoint has committed: the
+write already happened, so failing the response would only hide it.
+
+pytest: tests/conftest.py imports the `query_budget` fixture, e.g.
+`with query_budget(1): client.get(...)`; run `python -m pytest tests`.
+"""
+import functools
+import inspect
+import threading
+from collections import Counter
+
+from sqlalchemy import event
+
+import request_metrics
+from database import engine, async_engine
+
+_ENGINES = (engine, async_engine.sync_engine)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def _report(label, used, max_queries, statements):
+    lines = [f"{label}: {used} queries, budget {max_queries}"]
+    for sql, n in statements.most_common():
+        lines.append(f"  {n}x {' '.join(sql.split())[:200]}")
+    return "\n".join(lines)
+
+
+class QueryBudget:
+    """Context manager/decorator that fails if more than max_queries statements run inside it."""
+
+    def __init__(self, max_queries, label="query budget"):
+        self.max_queries = max_queries
+        self.label = label
+        self.statements = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def count(self):
+        return sum(self.statements.values())
+
+    def _observe(self, conn, cursor, statement, parameters, context, executemany):
+        with self._lock:
+            self.statements[statement] += 1
+
+    def __enter__(self):
+        self.statements.clear()
+        for e in _ENGINES:
+            event.listen(e, "after_cursor_execute", self._observe)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        for e in _ENGINES:
+            event.remove(e, "after_cursor_execute", self._observe)
+        if exc_type is None and self.count > self.max_queries:
+            raise QueryBudgetExceeded(_report(self.label, self.count, self.max_queries, self.statements))
+        return False
+
+    def __call__(self, fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                with QueryBudget(self.max_queries, self.label):
+                    return await fn(*args, **kwargs)
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with QueryBudget(self.max_queries, self.label):
+                    return fn(*args, **kwargs)
+        return wrapper
+
+
+def _check(fn, max_queries, stats, before, statements_before, commits_before):
+    used = stats.db_queries - before
+    if used <= max_queries:
+        return
+    statements = (stats.statements or Counter()) - statements_before
+    report = _report(f"{fn.__name__}()", used, max_queries, statements)
+    if request_metrics.QUERY_DEBUG and stats.db_commits == commits_before:
+        raise QueryBudgetExceeded(report)
+    print(f"⚠️ Query budget exceeded - {report}")
+
+
+def limit(max_queries):
+    """Endpoint decorator: per-request query budget for the endpoint body (place it under @app.get/...)."""
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                stats = request_metrics.current()
+                if stats is None:
+                    return await fn(*args, **kwargs)
+                before, statements_before = stats.db_queries, Counter(stats.statements or {})
+                commits_before = stats.db_commits
+                result = await fn(*args, **kwargs)
+                _check(fn, max_queries, stats, before, statements_before, commits_before)
+                return result
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                stats = request_metrics.current()
+                if stats is None:
+                    return fn(*args, **kwargs)
+                before, statements_before = stats.db_queries, Counter(stats.statements or {})
+                commits_before = stats.db_commits
+                result = fn(*args, **kwargs)
+                _check(fn, max_queries, stats, before, statements_before, commits_before)
+                return result
+        wrapper.query_budget = max_queries
+        return wrapper
+    return decorate
+
+
+try:
+    import pytest
+except ImportError:  # pytest is only needed for the fixture
+    pytest = None
+
+if pytest is not None:
+    @pytest.fixture
+    def query_budget():
+        """`with query_budget(n): ...` fails the test when the block runs more than n statements."""
+        return QueryBudget
@@ -0,0 +1,383 @@
+"""
+Receipt PDF rendering and background upload.
+
+/receipt/{order_id} only snapshots the order and hands it to `submit()`;
+the PDF is rendered in a small bounded thread pool and uploaded by a single
+background thread with retries, so slow ReportLab or storage never holds
+one of the request threads every other endpoint shares. Clients poll
+/receipt/jobs/{job_id} (see `get_job`) for the public URL.
+
+Receipts are content-addressed: the job key is a hash of every field the
+PDF shows, and the file is stored as receipt_{id}_{hash}.pdf. Asking again
+for an unchanged order returns the already-published URL with no
+rendering and no storage I/O; a paid order's receipt never changes. After
+a restart, or on another worker, the job first asks storage whether that
+file already exists and only renders and uploads when it does not.
+"""
+import hashlib
+import itertools
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from types import SimpleNamespace
+
+from reportlab.pdfgen import canvas
+
+import request_metrics
+
+RENDER_WORKERS = int(os.getenv("RECEIPT_RENDER_WORKERS", "2"))
+UPLOAD_ATTEMPTS = int(os.getenv("RECEIPT_UPLOAD_ATTEMPTS", "4"))
+UPLOAD_BACKOFF_SECONDS = 1.0   # doubles after every failed attempt
+MAX_JOBS = 1000                # finished jobs kept for status polling
+MAX_PUBLISHED = 5000           # fingerprint -> public URL entries kept
+
+PENDING, RENDERING, UPLOADING, DONE, FAILED = "pending", "rendering", "uploading", "done", "failed"
+
+
+def snapshot_order(order, items):
+    """Copy the fields the receipt needs off the ORM objects, so rendering never touches the DB session."""
+    return (
+        SimpleNamespace(
+            id=order.id, table_number=order.table_number, order_type=order.order_type,
+            created_at=order.created_at, subtotal=order.subtotal, discount_applied=order.discount_applied,
+            gst_amount=order.gst_amount, total_amount=order.total_amount,
+            payment_method=order.payment_method, paid_at=order.paid_at,
+        ),
+        [SimpleNamespace(item_name=i.item_name, quantity=i.quantity, price=i.price) for i in items],
+    )
+
+
+def fingerprint(order, items):
+    """Hash of everything render_pdf() prints; equal fingerprints mean byte-for-byte equivalent receipts."""
+    fields = (
+        order.id, order.table_number, order.order_type, order.created_at, order.subtotal, order.discount_applied,
+        order.gst_amount, order.total_amount, order.payment_method, order.paid_at,
+        tuple((i.item_name, i.quantity, i.price) for i in items),
+    )
+    return hashlib.sha256(repr(fields).encode("utf-8")).hexdigest()
+
+
+# --- PDF RENDERING ---
+def render_pdf(order, items):
+    """Render the thermal-style receipt (80mm width = 227 points) and return the PDF bytes."""
+    buffer = BytesIO()
+    # Use Letter size and adjust layout - better for viewing on screens
+    c = canvas.Canvas(buffer, pagesize=(227, 900))  # Increased height for better spacing
+
+    y = 880
+
+    # Premium Header with decorative box
+    c.setLineWidth(2.5)
+    c.rect(8, y-50, 211, 45, stroke=1, fill=0)
+    # Decorative corner elements
+    c.setLineWidth(1)
+    c.line(8, y-5, 18, y-5)
+    c.line(8, y-5, 8, y-15)
+    c.line(219, y-5, 209, y-5)
+    c.line(219, y-5, 219, y-15)
+    c.line(8, y-50, 18, y-50)
+    c.line(8, y-50, 8, y-40)
+    c.line(219, y-50, 209, y-50)
+    c.line(219, y-50, 219, y-40)
+    y -= 12
+
+    c.setFont("Helvetica-Bold", 18)
+    c.drawCentredString(113, y, "DESI ZAIKA")
+    y -= 16
+    c.setFont("Helvetica", 10)
+    c.drawCentredString(113, y, "Authentic Flavors")
+    y -= 12
+    c.setFont("Helvetica", 8)
+    c.drawCentredString(113, y, "Ghaziabad")
+    y -= 25
+
+    # Tax Invoice Header with decorative lines
+    c.setLineWidth(1)
+    c.line(10, y, 217, y)
+    y -= 8
+    c.setFont("Helvetica-Bold", 12)
+    c.drawCentredString(113, y, "TAX INVOICE")
+    y -= 8
+    c.line(10, y, 217, y)
+    y -= 18
+
+    # Order Details in box format
+    c.setFont("Helvetica", 9)
+    c.drawString(12, y, f"Order Number: #{order.id}")
+    table_text = f"Table: {order.table_number}" if order.order_type == "Dine-in" else f"{order.order_type} Order"
+    c.drawRightString(215, y, table_text)
+    y -= 14
+    c.drawString(12, y, f"Date: {order.created_at.strftime('%d %B %Y')}")
+    c.drawRightString(215, y, f"Time: {order.created_at.strftime('%I:%M %p')}")
+    y -= 20
+
+    # Items Section Header with double line
+    c.setLineWidth(1.5)
+    c.line(10, y, 217, y)
+    y -= 2
+    c.line(10, y, 217, y)
+    y -= 12
+    c.setFont("Helvetica-Bold", 9)
+    c.drawString(12, y, "ITEM DESCRIPTION")
+    c.drawString(140, y, "QTY")
+    c.drawRightString(215, y, "AMOUNT")
+    y -= 3
+    c.setLineWidth(1.5)
+    c.line(10, y, 217, y)
+    y -= 12
+
+    # Items List
+    c.setFont("Helvetica", 9)
+    for item in items:
+        # Better item name truncation with proper spacing
+        item_name = item.item_name[:20] if len(item.item_name) > 20 else item.item_name
+        # Draw item name (left aligned)
+        c.drawString(12, y, item_name)
+        # Draw quantity (centered in QTY column)
+        qty_width = c.stringWidth(str(item.quantity), "Helvetica", 9)
+        c.drawString(145 + (25 - qty_width)/2, y, str(item.quantity))
+        # Draw amount (right aligned)
+        amount = item.price * item.quantity
+        c.drawRightString(215, y, f"₹{amount:.2f}")
+        y -= 16  # Increased spacing between items
+        if y < 150: 
+            c.showPage() 
+            y = 880
+
+    y -= 5
+    c.setLineWidth(1.5)
+    c.line(10, y, 217, y)
+    y -= 18
+
+    # Bill Summary with proper alignment
+    c.setFont("Helvetica", 9)
+    c.drawRightString(150, y, "Subtotal:")
+    c.drawRightString(215, y, f"₹{order.subtotal:.2f}")
+    y -= 14
+
+    if order.discount_applied > 0:
+        discount_pct = (order.discount_applied / order.subtotal * 100) if order.subtotal > 0 else 0
+        c.drawRightString(150, y, f"Discount ({discount_pct:.0f}%):")
+        c.drawRightString(215, y, f"-₹{order.discount_applied:.2f}")
+        y -= 3
+        c.setLineWidth(0.5)
+        c.line(140, y, 215, y)
+        y -= 12
+        c.drawRightString(150, y, "Subtotal after disc:")
+        c.drawRightString(215, y, f"₹{order.subtotal - order.discount_applied:.2f}")
+        y -= 14
+
+    c.drawRightString(150, y, "GST @ 5%:")
+    c.drawRightString(215, y, f"₹{order.gst_amount:.2f}")
+    y -= 5
+
+    # Double line before total
+    c.setLineWidth(1.5)
+    c.line(10, y, 217, y)
+    y -= 2
+    c.line(10, y, 217, y)
+    y -= 16
+
+    c.setFont("Helvetica-Bold", 13)
+    c.drawRightString(150, y, "GRAND TOTAL:")
+    c.drawRightString(215, y, f"₹{order.total_amount:.2f}")
+    y -= 5
+    c.setLineWidth(1.5)
+    c.line(10, y, 217, y)
+    y -= 18
+
+    # Payment Info
+    c.setFont("Helvetica", 9)
+    if order.payment_method:
+        c.drawString(12, y, f"Payment Method: {order.payment_method.upper()}")
+        if order.paid_at:
+            c.drawRightString(215, y, f"Payment Time: {order.paid_at.strftime('%I:%M %p')}")
+        y -= 18
+
+    # Savings Message with decorative box
+    if order.discount_applied > 0:
+        c.setLineWidth(1)
+        c.rect(12, y-12, 193, 14, stroke=1, fill=0)
+        c.setFont("Helvetica-Bold", 10)
+        c.drawCentredString(113, y-2, f" You saved ₹{order.discount_applied:.2f} with your VIP discount!")
+        y -= 22
+
+    # Footer with decorative lines
+    c.setLineWidth(1.5)
+    c.line(10, y, 217, y)
+    y -= 2
+    c.line(10, y, 217, y)
+    y -= 14
+    c.setFont("Helvetica-Bold", 11)
+    c.drawCentredString(113, y, "Thank you for your visit!")
+    y -= 12
+    c.setFont("Helvetica", 9)
+    c.drawCentredString(113, y, "Please come again")
+    y -= 18
+    c.setLineWidth(1.5)
+    c.line(10, y, 217, y)
+    y -= 12
+
+    # Contact Info
+    c.setFont("Helvetica", 7)
+    c.drawCentredString(113, y, "Shop No. 46-47, 3rd Floor Food Court,")
+    y -= 9
+    c.drawCentredString(113, y, "Wave Galleria Shopping Complex, Wave City, Ghaziabad")
+    y -= 9
+    c.drawCentredString(113, y, "Call Us: +91 7683017632")
+    y -= 12
+
+    # Final decorative double line
+    c.setLineWidth(2)
+    c.line(10, y, 217, y)
+    y -= 2
+    c.line(10, y, 217, y)
+
+    c.save()
+
+    return buffer.getvalue()
+
+
+# --- JOBS ---
+_job_ids = itertools.count(1)
+_lock = threading.Lock()
+_jobs = OrderedDict()           # job_id -> job dict
+_active = {}                    # fingerprint -> job_id still rendering/uploading
+_published = OrderedDict()      # fingerprint -> public URL
+_render_pool = None
+_upload_queue = queue.Queue()
+_uploader = None
+_upload_fn = None
+_find_fn = None
+
+
+def configure(upload, find=None):
+    """
+    `upload(filename, pdf_bytes) -> public_url`, called from the background upload thread;
+    `find(filename) -> public_url or None` lets a job skip rendering a receipt that is already stored.
+    """
+    global _upload_fn, _find_fn
+    _upload_fn = upload
+    _find_fn = find
+
+
+def receipt_filename(order_id, fp):
+    return f"receipt_{order_id}_{fp[:16]}.pdf"
+
+
+def _ensure_workers():
+    global _render_pool, _uploader
+    with _lock:
+        if _render_pool is None:
+            _render_pool = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="receipt-render")
+        if _uploader is None or not _uploader.is_alive():
+            _uploader = threading.Thread(target=_upload_loop, name="receipt-upload", daemon=True)
+            _uploader.start()
+
+
+def shutdown():
+    global _render_pool, _uploader
+    with _lock:
+        pool, _render_pool = _render_pool, None
+        uploader, _uploader = _uploader, None
+    if pool:
+        pool.shutdown(wait=False, cancel_futures=True)
+    if uploader:
+        _upload_queue.put(None)
+
+
+def _set(job, **fields):
+    with _lock:
+        job.update(fields)
+        if fields.get("status") in (DONE, FAILED):
+            _active.pop(job["fingerprint"], None)
+        if fields.get("status") == DONE:
+            _published[job["fingerprint"]] = job["pdf_url"]
+            _published.move_to_end(job["fingerprint"])
+            while len(_published) > MAX_PUBLISHED:
+                _published.popitem(last=False)
+
+
+def submit(order, items):
+    """
+    Queue a receipt for an order snapshot and return its job. An unchanged receipt that was already
+    published comes back as a finished job; one already in flight is reused.
+    """
+    fp = fingerprint(order, items)
+    with _lock:
+        active = _active.get(fp)
+        if active in _jobs:
+            return dict(_jobs[active])
+        job_id = str(next(_job_ids))
+        job = {"job_id": job_id, "order_id": order.id, "fingerprint": fp, "status": PENDING,
+               "pdf_url": _published.get(fp), "error": None,
+               "total": order.total_amount, "discount": order.discount_applied}
+        if job["pdf_url"]:
+            job["status"] = DONE
+            _published.move_to_end(fp)
+        else:
+            _active[fp] = job_id
+        _jobs[job_id] = job
+        while len(_jobs) > MAX_JOBS:
+            _jobs.popitem(last=False)
+    if job["status"] == PENDING:
+        _ensure_workers()
+        _render_pool.submit(_render_job, job, order, items)
+    return dict(job)
+
+
+def get_job(job_id):
+    with _lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job else None
+
+
+def _render_job(job, order, items):
+    try:
+        filename = receipt_filename(order.id, job["fingerprint"])
+        # Published by another worker or before a restart: the content-addressed file is still valid
+        try:
+            url = _find_fn(filename) if _find_fn else None
+        except Exception as e:
+            print(f"Receipt lookup error (order {job['order_id']}): {e}")
+            url = None
+        if url:
+            _set(job, status=DONE, pdf_url=url)
+            return
+        _set(job, status=RENDERING)
+        with request_metrics.timed("render_pdf"):
+            pdf = render_pdf(order, items)
+        _set(job, status=UPLOADING)
+        _upload_queue.put((job, filename, pdf))
+    except Exception as e:
+        print(f"Receipt render error (order {job['order_id']}): {e}")
+        _set(job, status=FAILED, error=str(e))
+
+
+def _upload_loop():
+    while True:
+        item = _upload_queue.get()
+        if item is None:
+            return
+        job, filename, pdf = item
+        if _upload_fn is None:
+            _set(job, status=FAILED, error="Receipt storage not configured")
+            continue
+        delay = UPLOAD_BACKOFF_SECONDS
+        for attempt in range(1, UPLOAD_ATTEMPTS + 1):
+            try:
+                with request_metrics.timed("storage_put"):
+                    url = _upload_fn(filename, pdf)
+                _set(job, status=DONE, pdf_url=url)
+                break
+            except Exception as e:
+                print(f"Receipt upload error (order {job['order_id']}, attempt {attempt}): {e}")
+                if attempt == UPLOAD_ATTEMPTS:
+                    _set(job, status=FAILED, error=str(e))
+                else:
+                    time.sleep(delay)
+                    delay *= 2
@@ -0,0 +1,181 @@
+"""
+Per-request performance instrumentation.
+
+The `timing` middleware in main.py opens a RequestStats for every request.
+SQLAlchemy cursor events (see `instrument(engine)`) add each statement's
+count and time to it, whichever engine, thread or greenlet ran the query.
+`timed(stage)` does the same for other expensive work: ReportLab rendering,
+receipt storage. The totals come back as a `Server-Timing` header (visible in
+the browser devtools Timing tab) and as Prometheus histograms per route on
+/metrics:
+
+    http_request_duration_seconds{method,route,status}
+    http_request_db_queries{method,route}
+    http_request_db_seconds{method,route}
+    stage_duration_seconds{stage}       (render_pdf, storage_put, ...; background work included)
+
+Requests slower than SLOW_REQUEST_MS are also printed. With QUERY_DEBUG=1 every
+request also keeps its statements, and any statement that ran more than once
+(the N+1 signature) is printed with its count.
+"""
+import contextvars
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "1000"))
+QUERY_DEBUG = os.getenv("QUERY_DEBUG", "").lower() in ("1", "true", "yes")
+
+
+class RequestStats:
+    __slots__ = ("started", "db_queries", "db_seconds", "db_commits", "stages", "statements")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.db_commits = 0
+        self.stages = {}  # stage -> seconds
+        self.statements = Counter() if QUERY_DEBUG else None  # SQL text -> times executed
+
+    def repeated(self):
+        """Statements that ran more than once, most frequent first (empty unless QUERY_DEBUG)."""
+        return [(sql, n) for sql, n in (self.statements or Counter()).most_common() if n > 1]
+
+    def server_timing(self, total_seconds):
+        parts = [f"app;dur={total_seconds * 1000:.1f}",
+                 f'db;desc="{self.db_queries} queries";dur={self.db_seconds * 1000:.1f}']
+        parts += [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.stages.items()]
+        return ", ".join(parts)
+
+
+# A mutable stats object in a context var: the threadpool and the async engine's greenlets
+# run with a copy of the request's context, so they all update the same object.
+_current = contextvars.ContextVar("request_stats", default=None)
+
+
+def begin():
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+
+def end(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name, self.help_text, self.buckets = name, help_text, buckets
+        self._lock = threading.Lock()
+        self._series = {}  # label tuple -> [bucket counts..., sum, count]
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self, label_names):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                base = ",".join(f'{k}="{v}"' for k, v in zip(label_names, labels))
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {series[-1]}')
+                lines.append(f"{self.name}_sum{{{base}}} {series[-2]:.6f}")
+                lines.append(f"{self.name}_count{{{base}}} {series[-1]}")
+        return lines
+
+
+request_duration = Histogram("http_request_duration_seconds", "Time until the response headers are ready", LATENCY_BUCKETS)
+request_queries = Histogram("http_request_db_queries", "SQL statements executed per request", QUERY_BUCKETS)
+request_db_time = Histogram("http_request_db_seconds", "Time spent in SQL per request", LATENCY_BUCKETS)
+stage_duration = Histogram("stage_duration_seconds", "Time spent in instrumented stages", LATENCY_BUCKETS)
+
+
+# --- SQL (cursor events) ---
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.db_queries += 1
+        stats.db_seconds += elapsed
+        if stats.statements is not None:
+            stats.statements[statement] += 1
+
+
+def _commit(conn):
+    stats = _current.get()
+    if stats is not None:
+        stats.db_commits += 1
+
+
+def _handle_error(exception_context):
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def instrument(engine):
+    """Count/time every statement on engine (pass async_engine.sync_engine for async engines)."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+    event.listen(engine, "commit", _commit)
+
+
+# --- STAGES ---
+@contextmanager
+def timed(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_duration.observe((stage,), elapsed)
+        stats = _current.get()
+        if stats is not None:
+            stats.stages[stage] = stats.stages.get(stage, 0.0) + elapsed
+
+
+# --- REQUESTS ---
+def finish(stats, method, route, status_code):
+    """Record a finished request; returns the Server-Timing header value."""
+    total = time.perf_counter() - stats.started
+    request_duration.observe((method, route, str(status_code)), total)
+    request_queries.observe((method, route), stats.db_queries)
+    request_db_time.observe((method, route), stats.db_seconds)
+    if total * 1000 >= SLOW_REQUEST_MS:
+        print(f"🐢 Slow request: {method} {route} -> {status_code} in {total * 1000:.0f} ms "
+              f"({stats.db_queries} queries, {stats.db_seconds * 1000:.0f} ms SQL)")
+    for sql, n in stats.repeated():
+        print(f"🔁 {method} {route} ran the same statement {n}x: {' '.join(sql.split())[:200]}")
+    return stats.server_timing(total)
+
+
+def render():
+    lines = request_duration.render(("method", "route", "status"))
+    lines += request_queries.render(("method", "route"))
+    lines += request_db_time.render(("method", "route"))
+    lines += stage_duration.render(("stage",))
+    return "\n".join(lines) + "\n"
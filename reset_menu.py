@@ -1,9 +1,11 @@
 from sqlalchemy.orm import Session
-from database import SessionLocal, engine
+from database import SessionLocal
 import models
+import migrations
+import menu_cache
 
-# 1. Create the database tables if they don't exist
-models.Base.metadata.create_all(bind=engine)
+# 1. Bring the schema up to date (creates tables on a fresh DB)
+migrations.run_migrations()
 
 
 def reset_menu():
@@ -222,7 +224,8 @@ def reset_menu():
         db.add_all(users)
         print("✅ Users Created: owner/admin123, manager/man123, waiter/wait123")
 
-    db.commit()
+    # Bump the menu version so running servers drop their cached /menu/ snapshot
+    menu_cache.commit_and_bump(db)
     db.close()
     print("🎉 Success! Database reset. Users created. Menu uploaded.")
 
@@ -0,0 +1,134 @@
+"""
+Hourly sales rollups behind /owner/analytics/.
+
+`sales_hourly` and `item_sales_hourly` hold revenue, order count and item
+quantities per UTC hour (bucketed by the order's created_at, like the
+analytics always did). They are updated inside the same transaction as
+the order change:
+
+    place_order    -> record_order()
+    checkout_order -> adjust_revenue()   (discount changes the total)
+    cancel_order   -> remove_order()     (cancelled orders don't count)
+
+If they ever drift (manual SQL, restored backup...) rebuild from raw data:
+
+    python rollups.py rebuild                  # everything
+    python rollups.py rebuild --since 2025-01-01
+"""
+import argparse
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import func, insert, select, update
+
+import models
+
+sales = models.SalesHourly.__table__
+item_sales = models.ItemSalesHourly.__table__
+
+
+def hour_of(dt):
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+def _upsert_add(db, table, keys, rows):
+    """INSERT rows, or add their numeric columns onto the existing row with the same keys."""
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=keys,
+            set_={c: table.c[c] + stmt.excluded[c] for c in rows[0] if c not in keys},
+        )
+        db.execute(stmt)
+        return
+    for row in rows:
+        match = [table.c[k] == row[k] for k in keys]
+        values = {c: table.c[c] + v for c, v in row.items() if c not in keys}
+        if not db.execute(update(table).where(*match).values(**values)).rowcount:
+            db.execute(insert(table).values(**row))
+
+
+def _apply(db, created_at, revenue, order_count, items):
+    hour = hour_of(created_at)
+    _upsert_add(db, sales, ["hour_start"],
+                [{"hour_start": hour, "revenue": revenue, "order_count": order_count}])
+    qty = defaultdict(int)
+    for name, quantity in items:
+        qty[name] += quantity
+    _upsert_add(db, item_sales, ["hour_start", "item_name"],
+                [{"hour_start": hour, "item_name": name, "quantity": q} for name, q in qty.items()])
+
+
+def record_order(db, created_at, total_amount, items):
+    """Add a new order; `items` is an iterable of (item_name, quantity)."""
+    _apply(db, created_at, total_amount, 1, items)
+
+
+def adjust_revenue(db, created_at, delta):
+    if delta:
+        _apply(db, created_at, delta, 0, [])
+
+
+def remove_order(db, order):
+    """Take a cancelled order back out of the rollups."""
+    items = db.query(models.OrderItem.item_name, models.OrderItem.quantity).filter(
+        models.OrderItem.order_id == order.id).all()
+    _apply(db, order.created_at, -(order.total_amount or 0.0), -1, [(name, -q) for name, q in items])
+
+
+# --- REBUILD FROM RAW DATA ---
+def _hour_bucket(bind, column):
+    if bind.dialect.name == "postgresql":
+        return func.date_trunc("hour", column)
+    # Same text format SQLAlchemy uses for DateTime on SQLite, so range filters compare correctly
+    return func.strftime("%Y-%m-%d %H:00:00.000000", column)
+
+
+def rebuild(db, since=None):
+    """Recompute rollups for hours >= since (everything if None) from orders/order_items. Caller commits."""
+    bind = db.get_bind()
+    order_filter = [models.Order.status != "Cancelled"]
+    if since is not None:
+        since = hour_of(since)
+        order_filter.append(models.Order.created_at >= since)
+        db.execute(sales.delete().where(sales.c.hour_start >= since))
+        db.execute(item_sales.delete().where(item_sales.c.hour_start >= since))
+    else:
+        db.execute(sales.delete())
+        db.execute(item_sales.delete())
+
+    hour = _hour_bucket(bind, models.Order.created_at).label("hour_start")
+    db.execute(insert(sales).from_select(
+        ["hour_start", "revenue", "order_count"],
+        select(hour, func.coalesce(func.sum(models.Order.total_amount), 0.0), func.count(models.Order.id))
+        .where(*order_filter).group_by(hour)))
+    db.execute(insert(item_sales).from_select(
+        ["hour_start", "item_name", "quantity"],
+        select(hour, models.OrderItem.item_name, func.sum(models.OrderItem.quantity))
+        .join(models.Order, models.OrderItem.order_id == models.Order.id)
+        .where(*order_filter, models.OrderItem.item_name.isnot(None)).group_by(hour, models.OrderItem.item_name)))
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Maintain hourly sales rollups")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rb = sub.add_parser("rebuild", help="Recompute rollups from orders and order_items")
+    rb.add_argument("--since", help="Only rebuild from this date (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        rebuild(db, datetime.strptime(args.since, "%Y-%m-%d") if args.since else None)
+        db.commit()
+        print(f"✅ Rollups rebuilt: {db.query(func.count()).select_from(sales).scalar()} hourly rows")
+    finally:
+        db.close()
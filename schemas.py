@@ -0,0 +1,106 @@
+"""
+Response models for the hot read endpoints.
+
+Each model lists only the fields its screen uses, and the routes select
+just those columns. `render(adapter, rows)` validates the rows (ORM
+objects or `Row`s, read by attribute) and encodes them to JSON bytes in
+one pass through pydantic-core. That skips `jsonable_encoder`'s
+per-object reflection over SQLAlchemy instances. The routes still declare
+`response_model=` for the OpenAPI docs.
+
+    @app.get("/kitchen-display/", response_model=List[schemas.KitchenTicket])
+    ...
+    return schemas.render(schemas.kitchen_tickets, rows)
+"""
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import Response
+from pydantic import BaseModel, ConfigDict, TypeAdapter
+
+
+class _Out(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+
+class MenuItemOut(_Out):
+    id: int
+    name: str
+    price: float
+    category: Optional[str] = None
+    description: Optional[str] = None
+    image_url: Optional[str] = None
+    is_available: Optional[bool] = None
+    is_veg: Optional[bool] = None
+
+
+class KitchenTicket(_Out):
+    """Also the payload of the kitchen live stream events."""
+    id: int
+    table_number: Optional[int] = None
+    order_type: Optional[str] = None
+    status: Optional[str] = None
+    items_summary: Optional[str] = None
+    taken_by: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+
+class ManagerOrder(_Out):
+    id: int
+    table_number: Optional[int] = None
+    order_type: Optional[str] = None
+    status: Optional[str] = None
+    items_summary: Optional[str] = None
+    total_amount: Optional[float] = None
+    created_at: Optional[datetime] = None
+
+
+class ManagerOrders(_Out):
+    active: List[ManagerOrder]
+    history: List[ManagerOrder]
+    next_cursor: Optional[str] = None
+
+
+class CustomerOut(_Out):
+    id: int
+    name: Optional[str] = None
+    phone: str
+    relation: Optional[str] = None
+    discount_percent: Optional[float] = None
+    visit_count: Optional[int] = None
+
+
+class CustomerPage(_Out):
+    items: List[CustomerOut]
+    next_cursor: Optional[str] = None
+
+
+class InventoryRequestOut(_Out):
+    id: int
+    item_name: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+
+class InventoryPage(_Out):
+    items: List[InventoryRequestOut]
+    next_cursor: Optional[str] = None
+
+
+menu_items = TypeAdapter(List[MenuItemOut])
+kitchen_tickets = TypeAdapter(List[KitchenTicket])
+manager_orders = TypeAdapter(ManagerOrders)
+customer_page = TypeAdapter(CustomerPage)
+inventory_page = TypeAdapter(InventoryPage)
+
+
+def columns(model, schema):
+    """The model's columns named by the schema's fields, for a select() of just those."""
+    return [getattr(model, name) for name in schema.model_fields]
+
+
+def dump(adapter, data):
+    return adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+
+
+def render(adapter, data, **kwargs):
+    return Response(content=dump(adapter, data), media_type="application/json", **kwargs)
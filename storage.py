@@ -0,0 +1,134 @@
+"""
+Receipt storage backends, selected with RECEIPT_STORAGE:
+
+    supabase  Supabase Storage bucket (default when SUPABASE_URL/KEY are set)
+    local     files under RECEIPT_STORAGE_DIR, served by GET /files/receipts/{name}
+              (default otherwise - the on-prem counter PC mode)
+    memory    in-process dict, served by the same route (load tests / offline benchmarks)
+
+Every backend takes `put(filename, data) -> public_url` and `find(filename)`
+(the public URL if that file is already stored, else None). Receipt
+filenames are content-addressed, so whatever is stored is immutable and an
+existing file never needs uploading again.
+"""
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+
+SAFE_NAME = re.compile(r"^[A-Za-z0-9_.-]+$")
+LOCAL_URL_PREFIX = "/files/receipts/"
+
+
+class ReceiptStorage(ABC):
+    name = "base"
+
+    @abstractmethod
+    def put(self, filename: str, data: bytes) -> str:
+        """Store data under filename; returns its public URL."""
+
+    def find(self, filename: str):
+        """Public URL of an already stored file, or None."""
+        return None
+
+    def read(self, filename: str):
+        """Bytes for backends served by this app; None if missing or stored elsewhere."""
+        return None
+
+
+class SupabaseStorage(ReceiptStorage):
+    name = "supabase"
+
+    def __init__(self, url, key, bucket="receipts"):
+        from supabase import create_client
+        self.client = create_client(url, key)
+        self.bucket = bucket
+
+    def put(self, filename, data):
+        self.client.storage.from_(self.bucket).upload(
+            file=data,
+            path=filename,
+            file_options={"content-type": "application/pdf", "cache-control": "31536000", "upsert": "true"}
+        )
+        return self.client.storage.from_(self.bucket).get_public_url(filename)
+
+    def find(self, filename):
+        found = self.client.storage.from_(self.bucket).list("", {"search": filename, "limit": 1})
+        if any(f.get("name") == filename for f in found or []):
+            return self.client.storage.from_(self.bucket).get_public_url(filename)
+        return None
+
+
+class LocalStorage(ReceiptStorage):
+    name = "local"
+
+    def __init__(self, directory, base_url=""):
+        self.directory = directory
+        self.base_url = base_url.rstrip("/")
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, filename):
+        if not SAFE_NAME.match(filename):
+            raise ValueError(f"Invalid receipt filename: {filename}")
+        return os.path.join(self.directory, filename)
+
+    def put(self, filename, data):
+        path = self._path(filename)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)  # readers never see a half-written file
+        return self.base_url + LOCAL_URL_PREFIX + filename
+
+    def find(self, filename):
+        try:
+            return self.base_url + LOCAL_URL_PREFIX + filename if os.path.exists(self._path(filename)) else None
+        except ValueError:
+            return None
+
+    def read(self, filename):
+        try:
+            with open(self._path(filename), "rb") as f:
+                return f.read()
+        except (OSError, ValueError):
+            return None
+
+
+class MemoryStorage(ReceiptStorage):
+    name = "memory"
+
+    def __init__(self, base_url=""):
+        self.base_url = base_url.rstrip("/")
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def put(self, filename, data):
+        with self._lock:
+            self._files[filename] = data
+        return self.base_url + LOCAL_URL_PREFIX + filename
+
+    def find(self, filename):
+        with self._lock:
+            return self.base_url + LOCAL_URL_PREFIX + filename if filename in self._files else None
+
+    def read(self, filename):
+        with self._lock:
+            return self._files.get(filename)
+
+
+def create_storage():
+    supabase_url = os.getenv("SUPABASE_URL")
+    supabase_key = os.getenv("SUPABASE_KEY")
+    backend = os.getenv("RECEIPT_STORAGE") or ("supabase" if supabase_url and supabase_key else "local")
+    base_url = os.getenv("PUBLIC_BASE_URL", "")
+
+    if backend == "supabase":
+        if not (supabase_url and supabase_key):
+            print("⚠️ WARNING: Supabase credentials missing in .env. Receipt upload will fail.")
+            return None
+        return SupabaseStorage(supabase_url, supabase_key)
+    if backend == "local":
+        return LocalStorage(os.getenv("RECEIPT_STORAGE_DIR", "./receipts"), base_url)
+    if backend == "memory":
+        return MemoryStorage(base_url)
+    raise ValueError(f"Unknown RECEIPT_STORAGE backend: {backend}")
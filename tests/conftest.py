@@ -0,0 +1,27 @@
+import os
+import sys
+import tempfile
+
+# The app reads its configuration at import time: point it at a scratch database first
+_db_dir = tempfile.mkdtemp(prefix="restron-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ["RECEIPT_STORAGE"] = "memory"
+os.environ["QUERY_DEBUG"] = "1"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+
+from query_budget import query_budget  # noqa: F401  (the shipped fixture)
+
+
+@pytest.fixture(scope="session")
+def client():
+    import migrations
+    import reset_menu
+    migrations.run_migrations()
+    reset_menu.reset_menu()
+    import main
+    with TestClient(main.app) as c:
+        c.post("/token", data={"username": "manager", "password": "man123"})
+        yield c
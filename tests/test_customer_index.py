@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+
+import customer_index
+
+BASE = datetime(2025, 1, 1)
+ROWS = [
+    (1, "9876500001", "Ram Kumar", BASE),
+    (2, "9876500002", "Ramesh Rao", BASE + timedelta(days=1)),
+    (3, "9123404321", None, BASE + timedelta(days=2)),
+    (4, "98765 00004", "Anita Ram", BASE + timedelta(days=3)),
+    (5, "9000000005", "Kumar Sanu", BASE + timedelta(days=4)),
+]
+
+
+def test_search_orders_like_the_sql_pages():
+    idx = customer_index._Index(1, ROWS)
+    assert idx.search("ram", "alpha", 10) == [4, 1, 2]
+    assert idx.search("ram", "recent", 10) == [4, 2, 1]
+    assert idx.search("ram ku", "alpha", 10) == [1]
+    assert idx.search("98765", "alpha", 10) == [4, 1, 2]
+    assert idx.search("4321", "alpha", 10) == [3]
+    # Continues after the cursor's sort key
+    assert idx.search("ram", "alpha", 10, after=(0, "Anita Ram", 4)) == [1, 2]
+
+
+def test_with_customer_copies_instead_of_mutating():
+    idx = customer_index._Index(1, ROWS)
+    renamed = idx.with_customer(2, 5, "9000000005", "Raman Sanu", BASE + timedelta(days=4))
+    assert renamed.version == 2
+    assert renamed.search("kumar", "alpha", 10) == [1]
+    assert renamed.search("raman", "alpha", 10) == [5]
+    # A search still holding the old snapshot sees the old data
+    assert idx.search("kumar", "alpha", 10) == [5, 1]
+    assert idx.search("raman", "alpha", 10) == []
+
+
+def test_candidates_are_capped(monkeypatch):
+    monkeypatch.setattr(customer_index, "MAX_CANDIDATES", 2)
+    idx = customer_index._Index(1, ROWS)
+    # Only the first two phones in index order are ranked
+    assert idx.search("98765", "alpha", 10) == [1, 2]
@@ -0,0 +1,90 @@
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import text
+
+import history_cache
+import main
+import models
+import request_metrics
+from query_budget import QueryBudgetExceeded, limit
+from database import SessionLocal, engine
+
+
+def place_order(client):
+    response = client.post("/order/", json={"table_number": 2, "items": [{"menu_item_id": 1, "quantity": 2}]})
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def history_version():
+    db = SessionLocal()
+    try:
+        return models.read_version(db, history_cache.HISTORY_KEY)
+    finally:
+        db.close()
+
+
+def backdate(order_id, days):
+    db = SessionLocal()
+    try:
+        order = db.get(models.Order, order_id)
+        order.created_at -= timedelta(days=days)
+        db.commit()
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("days_ago", [0, 1, 2])
+def test_checkout_new_customer_with_discount_fits_budget(client, query_budget, capsys, days_ago):
+    # Worst case of checkout_order: new customer saved with a discount, on an order from a closed day
+    order_id = place_order(client)
+    backdate(order_id, days_ago)
+    version = history_version()
+    with query_budget(main.checkout_order.query_budget, "checkout, new customer + discount"):
+        response = client.post("/manager/checkout/", json={
+            "order_id": order_id, "payment_method": "UPI", "customer_phone": f"98765{order_id:05d}",
+            "customer_name": "Test Guest", "customer_discount": 10, "save_customer": True})
+    assert response.status_code == 200
+    assert response.json()["discount_applied"] > 0
+    assert "Query budget exceeded" not in capsys.readouterr().out
+    # Re-pricing an order from a closed day (yesterday included) must bump the shared history version
+    assert history_version() == (version + 1 if days_ago else version)
+
+
+def test_limit_raises_before_commit_under_query_debug():
+    @limit(1)
+    def two_reads():
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+
+    stats, token = request_metrics.begin()
+    try:
+        with pytest.raises(QueryBudgetExceeded):
+            two_reads()
+    finally:
+        request_metrics.end(token)
+
+
+def test_limit_only_logs_after_commit(capsys):
+    @limit(1)
+    def write_then_read():
+        with engine.begin() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+        return "committed"
+
+    stats, token = request_metrics.begin()
+    try:
+        assert write_then_read() == "committed"
+    finally:
+        request_metrics.end(token)
+    assert "Query budget exceeded" in capsys.readouterr().out
+
+
+def test_query_budget_fixture_fails_over_budget(query_budget):
+    with pytest.raises(QueryBudgetExceeded):
+        with query_budget(0, "one statement"):
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
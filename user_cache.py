@@ -0,0 +1,58 @@
+"""
+Small TTL/LRU cache of staff accounts for get_current_user.
+
+The JWT already carries `sub` and `role`; this cache only confirms the
+account still exists with that role, so steady-state kitchen/dashboard
+traffic does no `users` query. Missing users are cached too (as None) so a
+revoked token can't hammer the DB. Call `invalidate(username)` whenever a
+role changes or an account is removed; anything changed outside the app
+is picked up after TTL_SECONDS.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "300"))
+MAX_USERS = 256
+
+
+class StaffUser(NamedTuple):
+    id: int
+    username: str
+    role: str
+
+
+_lock = threading.Lock()
+_entries = OrderedDict()  # username -> (expires_at, StaffUser | None)
+
+
+def get(username):
+    """Returns (hit, user); user is None for a cached 'no such user'."""
+    with _lock:
+        entry = _entries.get(username)
+        if entry is None:
+            return False, None
+        if entry[0] < time.monotonic():
+            del _entries[username]
+            return False, None
+        _entries.move_to_end(username)
+        return True, entry[1]
+
+
+def put(username, user):
+    with _lock:
+        _entries[username] = (time.monotonic() + TTL_SECONDS, user)
+        _entries.move_to_end(username)
+        while len(_entries) > MAX_USERS:
+            _entries.popitem(last=False)
+
+
+def invalidate(username=None):
+    """Forget one user (or everyone when username is None)."""
+    with _lock:
+        if username is None:
+            _entries.clear()
+        else:
+            _entries.pop(username, None)